@@ -1,11 +1,13 @@
 #Load libraries needed
 import streamlit as st
+import time
 from st_pages import Page, show_pages, add_page_title, show_pages_from_config, hide_pages
-import base64
 from st_clickable_images import clickable_images
-from model.power_comsumption_predictor import PowerConsumptionPredictor
-from utils.df_getter import get_df
+from utils.images import get_flag_images
+from utils.warmup import start_warmup
+from model.instrumentation import COUNTERS
 
+page_started = time.perf_counter()
 if 'language' not in st.session_state:
     st.session_state['language'] = 'ru'
 
@@ -30,7 +32,9 @@ text = {'menu_home': {'en': 'Home', 'ru': 'Главная'},
             - Получить почасовой прогноз потребления электроэнергии на сегодняшний день
             - Сравнить прогнозы для прошедших дней с фактическим энергопотреблением и оценить качество модели
             - Узнать больше о проекте, задаче и данных, на которых обучена модель
-            """}
+            """},
+         'warmup': {'en': 'Preparing the forecast model...', 'ru': 'Готовим модель прогноза...'},
+         'today_forecast': {'en': "Today's forecast, MWh", 'ru': 'Прогноз на сегодня, МВт*ч'}
          }
 
 # Set page configuration 
@@ -38,18 +42,14 @@ st.set_page_config(
     page_title=text['app_title'][st.session_state['language']]
 )
 
-if 'pcp' not in st.session_state:
-    st.session_state['pcp'] = PowerConsumptionPredictor(get_df())
+#all sessions share one predictor per data version. it is built in the background,
+#so the page is drawn right away and the forecast is added when the predictor is ready
+warmup = start_warmup()
 
 #add a sidebar to select pages
 with st.sidebar:
-    images = []
-    for file in ["images/russia.png", "images/united-kingdom.png"]:
-        with open(file, "rb") as image:
-            encoded = base64.b64encode(image.read()).decode()
-            images.append(f"data:image/jpeg;base64,{encoded}")
-
-    clicked = clickable_images(images,
+    #the flags are encoded once per process
+    clicked = clickable_images(list(get_flag_images()),
                                titles=['RU', 'EN'],
                                div_style={"display": "flex", "justify-content": "center", "flex-wrap": "wrap"},
                                img_style={"margin": "5px", "height": "25px"})
@@ -91,3 +91,23 @@ with subheader_container:
     st.write(text['project_task'][st.session_state['language']])
     st.subheader(text['app_contents'][st.session_state['language']])
     st.markdown(text['bullets'][st.session_state['language']])
+
+#everything above is on screen, only the forecast below waits for the warm-up
+COUNTERS.add('stage', 'home_first_paint', time.perf_counter() - page_started)
+
+forecast_container = st.container()
+with forecast_container:
+    if not warmup.finished.is_set():
+        progress = st.progress(warmup.progress, text=text['warmup'][st.session_state['language']])
+        while not warmup.finished.wait(0.1):
+            progress.progress(warmup.progress, text=text['warmup'][st.session_state['language']])
+        progress.empty()
+    if warmup.error is not None:
+        raise warmup.error
+    st.session_state['pcp'] = warmup.predictor
+
+    today = st.session_state['pcp'].get_today()
+    forecast = st.session_state['pcp'].forecast_today(today, today)
+    st.subheader(text['today_forecast'][st.session_state['language']])
+    st.line_chart(forecast, x='datetime', y='predict')
+COUNTERS.add('stage', 'home_forecast', time.perf_counter() - page_started)
@@ -0,0 +1,48 @@
+"""
+Payload size and server-side build time of the Archive chart (predict and
+target lines) for periods from a week to 20 years: every hourly point as SVG
+traces, every point as WebGL traces, and LTTB-downsampled WebGL traces as the
+pages draw them. Browser render time grows with the number of points sent,
+which is printed as well. Run from the repository root:
+
+    python -m benchmarks.bench_charts
+"""
+import timeit
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from benchmarks.synthetic import make_power_cons
+from utils.chart_downsampler import downsample, lttb_indices, MAX_POINTS
+
+def make_forecast_fact(years):
+    raw = make_power_cons(years)
+    datetime = pd.to_datetime(raw['date']) + pd.to_timedelta(raw['time'], unit='h')
+    noise = np.random.default_rng(0).normal(0, 10, len(raw))
+    return pd.DataFrame({'datetime': datetime.dt.strftime('%Y-%m-%d %H:%M:%S'), 'predict': raw['target'] + noise, 'target': raw['target']})
+
+def build_chart(df, render_mode, max_points=None):
+    if max_points is not None:
+        df = downsample(df, ['predict', 'target'], max_points)
+    return px.line(df, x='datetime', y=['predict', 'target'], render_mode=render_mode).to_json()
+
+def check_shape(df):
+    """
+    LTTB keeps the extremes of a series: the downsampled line reaches the daily peaks
+    """
+    positions = lttb_indices(df['target'].to_numpy(), MAX_POINTS)
+    kept, full = df['target'].iloc[positions], df['target']
+    print(f'{len(full)} points -> {len(kept)}: max {kept.max():.1f} of {full.max():.1f}, min {kept.min():.1f} of {full.min():.1f}')
+
+def main(repeat=3):
+    check_shape(make_forecast_fact(5))
+    print(f"{'period':>8} {'points':>8} {'mode':<16} {'sent':>7} {'payload, KB':>12} {'build, ms':>10}")
+    for label, years in [('1 week', 7 / 365.25), ('1 year', 1), ('5 years', 5), ('20 years', 20)]:
+        df = make_forecast_fact(years)
+        for mode, render_mode, max_points in [('svg', 'svg', None), ('webgl', 'webgl', None), ('webgl + lttb', 'webgl', MAX_POINTS)]:
+            payload = build_chart(df, render_mode, max_points)
+            sent = min(len(df), len(downsample(df, ['predict', 'target'], max_points))) if max_points else len(df)
+            build_ms = min(timeit.repeat(lambda: build_chart(df, render_mode, max_points), number=1, repeat=repeat)) * 1000
+            print(f'{label:>8} {len(df):>8} {mode:<16} {sent:>7} {len(payload) / 1024:>12.0f} {build_ms:>10.1f}')
+
+if __name__ == '__main__':
+    main()
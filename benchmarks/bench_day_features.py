@@ -0,0 +1,54 @@
+"""
+Checks that PowerConsumptionPredictor.preprocess gives the same features as
+the legacy preprocessing, then times the day-level steps: hour-level merges
+and string isin (legacy add_weather_and_daylight, add_daysoff and
+add_school_vacations) against add_day_features broadcasting per-date values.
+Run from the repository root:
+
+    python -m benchmarks.bench_day_features
+"""
+import timeit
+import pandas as pd
+from benchmarks.legacy_preprocess import LegacyPreprocessor
+from benchmarks.synthetic import make_power_cons
+from model.power_comsumption_predictor import PowerConsumptionPredictor, STAGE1_FEATURES, STAGE2_FEATURES
+
+def check_equivalence(pcp, legacy, raw):
+    expected = legacy.preprocess(raw.copy())
+    got = pcp.preprocess(raw.copy()).reset_index(drop=True)
+    columns = [column for column in expected.columns if column in got.columns]
+    #the features the models read must be bitwise equal, a last-digit difference
+    #can cross a stage 2 split
+    model_columns = [column for column in columns if column in STAGE1_FEATURES + STAGE2_FEATURES]
+    pd.testing.assert_frame_equal(got[model_columns], expected[model_columns], check_dtype=False, check_exact=True)
+    #FEATURE_SCHEMA stores the other float statistics as float32
+    other = [column for column in columns if column not in model_columns]
+    pd.testing.assert_frame_equal(got[other], expected[other], check_dtype=False, check_exact=False, rtol=1e-6)
+
+def legacy_day_steps(legacy, df):
+    df = legacy.add_weather_and_daylight(df.copy())
+    df = legacy.add_daysoff(df)
+    return legacy.add_school_vacations(df)
+
+def day_steps(pcp, df):
+    df = pcp.add_day_features(df.copy())
+    df = pcp.add_weather_and_daylight(df)
+    return pcp.add_daysoff(df)
+
+def main(repeat=5):
+    pcp = PowerConsumptionPredictor.__new__(PowerConsumptionPredictor)
+    legacy = LegacyPreprocessor()
+
+    #calendars and vacations cover 2019-2023, start earlier to also check the gaps
+    check_equivalence(pcp, legacy, make_power_cons(6, start='2018-06-01'))
+    print('preprocess output matches the legacy implementation')
+
+    print(f"{'years':>5} {'rows':>8} {'legacy, ms':>11} {'day table, ms':>14}")
+    for years in [1, 5, 20]:
+        df = legacy.add_lags(legacy.add_calendar_features(make_power_cons(years).ffill()))
+        old_ms = min(timeit.repeat(lambda: legacy_day_steps(legacy, df), number=1, repeat=repeat)) * 1000
+        new_ms = min(timeit.repeat(lambda: day_steps(pcp, df), number=1, repeat=repeat)) * 1000
+        print(f'{years:>5} {len(df):>8} {old_ms:>11.1f} {new_ms:>14.1f}')
+
+if __name__ == '__main__':
+    main()
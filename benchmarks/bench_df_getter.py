@@ -0,0 +1,75 @@
+"""
+Checks the power_cons data access of utils/power_cons_db.py against a local
+SQLite stand-in of the database and compares it with the previous
+SELECT * fetch: time and peak memory of the full projected history, of a
+date window pushed into the query, and of a sample. The stand-in table has
+two extra columns the predictor never reads, as production tables usually
+do. Run from the repository root:
+
+    python -m benchmarks.bench_df_getter --years 5
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+from sqlalchemy import create_engine
+from benchmarks.synthetic import make_power_cons
+from utils.power_cons_db import read_power_cons, POWER_CONS_COLUMNS
+
+def make_database(path, years):
+    raw = make_power_cons(years)
+    raw['date'] = pd.to_datetime(raw['date']).dt.strftime('%Y-%m-%d')
+    raw['id'] = range(len(raw))
+    raw['source'] = 'ats_so_ups_kaliningrad_hourly_report'
+    engine = create_engine(f'sqlite:///{path}')
+    raw.to_sql('power_cons', engine, index=False, chunksize=10000)
+    return engine, raw
+
+def measure(function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = function()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return df, seconds, peak
+
+def check(engine, raw):
+    """
+    The projected, windowed and limited reads return the same rows as the table
+    """
+    expected = raw[POWER_CONS_COLUMNS]
+    pd.testing.assert_frame_equal(read_power_cons(engine, chunk_rows=7000), expected)
+
+    last = pd.Timestamp(raw['date'].iloc[-1])
+    start = last - pd.Timedelta(days=8)
+    window = read_power_cons(engine, start_date=start, end_date=last)
+    pd.testing.assert_frame_equal(window, expected[pd.to_datetime(expected['date']) >= start].reset_index(drop=True))
+
+    sample = read_power_cons(engine, limit=10)
+    pd.testing.assert_frame_equal(sample, expected.head(10))
+    print('projected, windowed and sample reads match the table')
+
+def main():
+    parser = argparse.ArgumentParser(description='power_cons reads against a SQLite stand-in')
+    parser.add_argument('--years', type=float, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine, raw = make_database(os.path.join(directory, 'power_cons.sqlite'), args.years)
+        check(engine, raw)
+        last = pd.Timestamp(raw['date'].iloc[-1])
+        reads = [('SELECT * (previous)', lambda: pd.read_sql('SELECT * FROM power_cons ;', engine)),
+                 ('projected history', lambda: read_power_cons(engine)),
+                 ('projected, last 9 days', lambda: read_power_cons(engine, start_date=last - pd.Timedelta(days=8))),
+                 ('sample of 10 rows', lambda: read_power_cons(engine, limit=10))]
+        print(f"{'read':<24} {'rows':>8} {'columns':>8} {'time, ms':>9} {'peak, MB':>9}")
+        for label, function in reads:
+            df, seconds, peak = measure(function)
+            print(f'{label:<24} {len(df):>8} {len(df.columns):>8} {seconds * 1000:>9.1f} {peak / 2**20:>9.1f}')
+        engine.dispose()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Checks the incremental refresh of utils/history_cache.py against a local
+SQLite stand-in of the database and compares it with reloading the whole
+table: the first load, a restart that reads the Parquet parts, a refresh
+after one new day is appended, and a refresh with the database down. Run
+from the repository root:
+
+    python -m benchmarks.bench_history_cache --years 5
+"""
+import argparse
+import os
+import tempfile
+import time
+import pandas as pd
+from sqlalchemy import create_engine
+from benchmarks.bench_df_getter import make_database
+from utils.history_cache import HistoryCache
+from utils.power_cons_db import read_power_cons, POWER_CONS_COLUMNS
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+def split_last_day(engine, raw):
+    # The last day is removed from the table and returned, to be appended later
+    last = raw['date'].iloc[-1]
+    with engine.begin() as connection:
+        connection.exec_driver_sql('DELETE FROM power_cons WHERE date = ?', (last,))
+    return raw[raw['date'] == last]
+
+def check_equal(cache, engine):
+    expected = read_power_cons(engine)
+    df, _ = cache.get(engine, max_age=float('inf'))
+    # get_df slices date ranges and samples out of the hour-sorted frame
+    assert df.index.is_monotonic_increasing, 'cached rows are not sorted by hour'
+    pd.testing.assert_frame_equal(df[POWER_CONS_COLUMNS].reset_index(drop=True), expected)
+
+def main():
+    parser = argparse.ArgumentParser(description='incremental history refresh against a SQLite stand-in')
+    parser.add_argument('--years', type=float, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine, raw = make_database(os.path.join(directory, 'power_cons.sqlite'), args.years)
+        last_day = split_last_day(engine, raw)
+        path = os.path.join(directory, 'cache')
+        rows = []
+
+        cache = HistoryCache(path)
+        added, seconds = timed(lambda: cache.refresh(engine))
+        rows.append(('first load (full)', added, seconds))
+        check_equal(cache, engine)
+        first_version = cache.version
+
+        restarted = HistoryCache(path)
+        added, seconds = timed(lambda: restarted.refresh(engine))
+        rows.append(('restart, no new rows', added, seconds))
+        assert restarted.version == first_version, 'the version changed without new rows'
+
+        last_day.to_sql('power_cons', engine, index=False, if_exists='append')
+        added, seconds = timed(lambda: restarted.refresh(engine))
+        rows.append(('refresh after a new day', added, seconds))
+        check_equal(restarted, engine)
+        assert restarted.version != first_version, 'the version did not change with new rows'
+
+        _, seconds = timed(lambda: read_power_cons(engine))
+        rows.append(('full reload (previous)', len(raw), seconds))
+
+        down = create_engine(f"sqlite:///{os.path.join(directory, 'missing', 'power_cons.sqlite')}")
+        added, seconds = timed(lambda: restarted.refresh(down))
+        rows.append(('refresh, database down', added, seconds))
+        df, version = restarted.get(down, max_age=float('inf'))
+        assert len(df) == len(raw) and version == restarted.version, 'cached rows are not served'
+        print('cached rows match the table, the version changes only with new rows, '
+              'cached rows are served while the database is down')
+
+        print(f"{'refresh':<26} {'new rows':>9} {'time, ms':>9}")
+        for label, added, seconds in rows:
+            print(f"{label:<26} {added if added is not None else '-':>9} {seconds * 1000:>9.1f}")
+        print(f"parts on disk: {len(restarted.state['parts'])}")
+        engine.dispose()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Accuracy drift check of the final forecasts against the legacy pipeline and
+timings of the inference path: both models called on the predictor's
+contiguous feature matrices against the previous DataFrame path (column
+lists selected from the feature frame and passed to the pipeline and the
+booster). Also shows how many stage 2 predictions a float32
+matrix would change. Run from the repository root:
+
+    python -m benchmarks.bench_inference
+"""
+import timeit
+import numpy as np
+import pandas as pd
+from benchmarks.legacy_preprocess import LegacyPredictor
+from benchmarks.run_suite import build_predictor
+from benchmarks.synthetic import make_power_cons
+from model.power_comsumption_predictor import STAGE2_FEATURES, predict_booster
+
+def dataframe_forecast(pcp, rows):
+    test = pcp.df.iloc[rows]
+    return test['pred_stage1'].to_numpy() + pcp.lgbm_model.predict(test[STAGE2_FEATURES])
+
+def matrix_forecast(pcp, rows, num_threads=None):
+    return pcp.df['pred_stage1'].to_numpy()[rows] + predict_booster(pcp.lgbm_model, pcp.stage2_matrix[rows], num_threads)
+
+def check_drift(pcp, raw):
+    """
+    Final forecasts of the predictor against the legacy float64 pipeline, both
+    models included, over the whole history and single days. Both sides start
+    from the raw data, so drift from any preprocessing or inference step shows
+    """
+    legacy = LegacyPredictor(raw.copy(), pcp.lin_model, pcp.lgbm_model)
+    first, last = pcp.df['date'].iloc[0], pcp.df['date'].iloc[-1]
+    windows = [(first, last)] + [(day, day) for day in pd.date_range(first, last, freq='29D')] + [(last, last)]
+    drift = 0
+    for start, end in windows:
+        expected = legacy.forecast_today(start, end).reset_index(drop=True)
+        got = pcp.forecast_today(start, end)
+        assert (got['datetime'] == expected['datetime']).all(), f'forecast hours differ for {start:%Y-%m-%d}..{end:%Y-%m-%d}'
+        drift = max(drift, np.abs(got['predict'].to_numpy() - expected['predict'].to_numpy()).max())
+    print(f'forecast_today vs the legacy pipeline: max abs diff {drift:.3g} MWh over {len(windows)} windows')
+    #stage 1 runs as a fused kernel, which rounds differently from the pipeline in the
+    #last bits; stage 2 inputs are bitwise equal, so no tree split may change
+    assert drift < 1e-6, f'forecasts drifted by {drift:.3g} MWh'
+
+    float32 = predict_booster(pcp.lgbm_model, pcp.stage2_matrix.astype('float32'))
+    changed = float32 != predict_booster(pcp.lgbm_model, pcp.stage2_matrix)
+    print(f'a float32 stage 2 matrix would change {changed.sum()} predictions, '
+          f'by up to {np.abs(float32 - predict_booster(pcp.lgbm_model, pcp.stage2_matrix)).max():.3g} MWh')
+
+def main(repeat=20):
+    for seed in [0, 3, 7]:
+        raw = make_power_cons(2, seed=seed)
+        pcp, shipped_models = build_predictor(raw)
+        check_drift(pcp, raw)
+    pcp, shipped_models = build_predictor(make_power_cons(5))
+    print('shipped models' if shipped_models else 'stand-in stage 2 model')
+
+    end = len(pcp.df)
+    print(f"{'hours':>6} {'DataFrame, ms':>14} {'matrix, ms':>11} {'1 thread, ms':>13} {'4 threads, ms':>14}")
+    for hours in [24, 24 * 7, 24 * 31, end]:
+        rows = slice(end - hours, end)
+        times = [min(timeit.repeat(call, number=1, repeat=repeat)) * 1000 for call in
+                 [lambda: dataframe_forecast(pcp, rows), lambda: matrix_forecast(pcp, rows),
+                  lambda: matrix_forecast(pcp, rows, 1), lambda: matrix_forecast(pcp, rows, 4)]]
+        print(f'{hours:>6} {times[0]:>14.2f} {times[1]:>11.2f} {times[2]:>13.2f} {times[3]:>14.2f}')
+
+if __name__ == '__main__':
+    main()
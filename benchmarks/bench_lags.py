@@ -0,0 +1,45 @@
+"""
+Checks that add_lags gives the same target_lag_*, temp_lag_* and yesterday_*
+columns as the legacy shift/groupby/merge implementation, then times both on
+multi-year data. Run from the repository root:
+
+    python -m benchmarks.bench_lags
+"""
+import timeit
+import numpy as np
+import pandas as pd
+from benchmarks.legacy_preprocess import LegacyPreprocessor
+from benchmarks.synthetic import make_power_cons
+from model.power_comsumption_predictor import PowerConsumptionPredictor
+
+def check_equivalence(pcp, legacy, df):
+    expected = legacy.add_lags(df.copy()).reset_index(drop=True)
+    got = pcp.add_lags(df.copy()).reset_index(drop=True)
+    #bitwise: a last-digit difference in a yesterday statistic can cross a stage 2 split
+    pd.testing.assert_frame_equal(got, expected, check_exact=True)
+
+def main(repeat=5):
+    pcp = PowerConsumptionPredictor.__new__(PowerConsumptionPredictor)
+    legacy = LegacyPreprocessor()
+    df = legacy.add_calendar_features(make_power_cons(2).ffill())
+
+    #whole days go through the (days x 24) kernel
+    check_equivalence(pcp, legacy, df)
+    check_equivalence(pcp, legacy, legacy.add_calendar_features(make_power_cons(5, seed=3).ffill()))
+    #missing values inside a day
+    with_gaps = df.copy()
+    with_gaps.loc[np.random.default_rng(0).choice(len(df), 200, replace=False), ['target', 'temp']] = np.nan
+    check_equivalence(pcp, legacy, with_gaps)
+    #a missing hour falls back to add_lags_grouped
+    check_equivalence(pcp, legacy, df.drop(index=5000))
+    print('add_lags output matches the legacy implementation')
+
+    print(f"{'years':>5} {'rows':>8} {'legacy, ms':>11} {'kernel, ms':>11}")
+    for years in [1, 5, 20]:
+        df = legacy.add_calendar_features(make_power_cons(years).ffill())
+        old_ms = min(timeit.repeat(lambda: legacy.add_lags(df.copy()), number=1, repeat=repeat)) * 1000
+        new_ms = min(timeit.repeat(lambda: pcp.add_lags(df.copy()), number=1, repeat=repeat)) * 1000
+        print(f'{years:>5} {len(df):>8} {old_ms:>11.1f} {new_ms:>11.1f}')
+
+if __name__ == '__main__':
+    main()
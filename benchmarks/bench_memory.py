@@ -0,0 +1,28 @@
+"""
+Bytes per row held by a predictor: the legacy feature frame with default int64/
+float64 types, the datetime string column and the retained raw frame, against
+the frame typed by FEATURE_SCHEMA. Both include the two float64 stage-1 columns.
+Run from the repository root:
+
+    python -m benchmarks.bench_memory
+"""
+from benchmarks.legacy_preprocess import LegacyPreprocessor
+from benchmarks.synthetic import make_power_cons
+from model.power_comsumption_predictor import PowerConsumptionPredictor
+
+def bytes_per_row(df, rows):
+    return df.memory_usage(index=True, deep=True).sum() / rows
+
+def main():
+    pcp = PowerConsumptionPredictor.__new__(PowerConsumptionPredictor)
+    legacy = LegacyPreprocessor()
+    print(f"{'years':>5} {'rows':>8} {'before, B/row':>14} {'after, B/row':>13}")
+    for years in [1, 5, 20]:
+        raw = make_power_cons(years)
+        before = legacy.preprocess(raw.copy()).assign(pred_stage1=0.0, stage1_error=0.0)
+        after = pcp.preprocess(raw.copy()).assign(pred_stage1=0.0, stage1_error=0.0)
+        rows = len(after)
+        print(f'{years:>5} {rows:>8} {bytes_per_row(before, rows) + bytes_per_row(raw, rows):>14.0f} {bytes_per_row(after, rows):>13.0f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Latency of picking a forecast window with its fact column on 1, 5 and 20 years
+of hourly data: full-frame boolean masks plus a merge on the datetime string
+(the previous predict_second/forecast_vs_fact) against a slice of the sorted
+hourly index. Run from the repository root:
+
+    python -m benchmarks.bench_range_slicing
+"""
+import timeit
+import pandas as pd
+from benchmarks.legacy_preprocess import LegacyPreprocessor
+from benchmarks.synthetic import make_power_cons
+from model.power_comsumption_predictor import PowerConsumptionPredictor
+
+def mask_and_merge(df, start_date, end_date):
+    test = df[(df['date'] >= start_date) & (df['date'] <= end_date)]
+    sub = pd.DataFrame({'datetime': test['datetime'], 'predict': test['target_lag_24']})
+    return sub.merge(df, how='left', on='datetime')[['datetime', 'predict', 'target']]
+
+def index_slice(pcp, df, start_date, end_date):
+    test = df.iloc[pcp.get_date_slice(df, start_date, end_date)]
+    return pd.DataFrame({'datetime': test.index.strftime('%Y-%m-%d %H:%M:%S'), 'predict': test['target_lag_24'].values,
+                         'target': test['target'].values})
+
+def main(repeat=20):
+    #only the preprocessing is needed here, so the models are not loaded
+    pcp = PowerConsumptionPredictor.__new__(PowerConsumptionPredictor)
+    legacy = LegacyPreprocessor()
+    print(f"{'years':>5} {'rows':>8} {'mask+merge, ms':>15} {'index slice, ms':>16}")
+    for years in [1, 5, 20]:
+        raw = make_power_cons(years)
+        legacy_df, df = legacy.preprocess(raw.copy()), pcp.preprocess(raw.copy())
+        #a week in the middle of the history
+        start = df['date'].iloc[len(df) // 2]
+        start_date, end_date = str(start.date()), str((start + pd.Timedelta(days=6)).date())
+
+        old, new = mask_and_merge(legacy_df, start_date, end_date), index_slice(pcp, df, start_date, end_date)
+        pd.testing.assert_frame_equal(old, new, check_dtype=False)
+
+        old_ms = min(timeit.repeat(lambda: mask_and_merge(legacy_df, start_date, end_date), number=1, repeat=repeat)) * 1000
+        new_ms = min(timeit.repeat(lambda: index_slice(pcp, df, start_date, end_date), number=1, repeat=repeat)) * 1000
+        print(f'{years:>5} {len(df):>8} {old_ms:>15.2f} {new_ms:>16.2f}')
+
+if __name__ == '__main__':
+    main()
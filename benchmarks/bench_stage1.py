@@ -0,0 +1,54 @@
+"""
+Checks that the fused stage 1 kernel (FusedLinearModel) gives the same
+predictions as the pickled StandardScaler + Lasso pipeline, on synthetic
+feature frames and on random feature values, then times both. Run from the
+repository root:
+
+    python -m benchmarks.bench_stage1
+"""
+import timeit
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import make_power_cons
+from model.model_registry import get_model
+from model.power_comsumption_predictor import (PowerConsumptionPredictor, FusedLinearModel, STAGE1_FEATURES, MONTHS,
+                                               get_feature_matrix)
+
+def random_features(rows, seed=0):
+    """
+    Returns random values of the stage 1 features with a consistent month one-hot
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.normal(0, 300, (rows, len(STAGE1_FEATURES))), columns=STAGE1_FEATURES)
+    df['month'] = rng.integers(1, 13, rows)
+    for month, name in MONTHS.items():
+        df[name] = np.where(df['month'] == month, 1, 0)
+    return df
+
+def check_equivalence(pipeline, kernel, df):
+    expected = pipeline.predict(df[STAGE1_FEATURES])
+    got = kernel.predict(df)
+    print(f'{len(df):>8} rows: max abs diff {np.abs(got - expected).max():.3g}, max rel diff {np.abs(got / expected - 1).max():.3g}')
+    np.testing.assert_allclose(got, expected, rtol=1e-12, atol=1e-9)
+
+def main(repeat=10):
+    pipeline = get_model('stage1')
+    kernel = FusedLinearModel(pipeline)
+    print(f'fused kernel: {len(kernel.features)} of {len(STAGE1_FEATURES)} features, 12 month intercepts')
+
+    pcp = PowerConsumptionPredictor.__new__(PowerConsumptionPredictor)
+    features = {years: pcp.preprocess(make_power_cons(years)) for years in [1, 5, 20]}
+    for df in features.values():
+        check_equivalence(pipeline, kernel, df)
+    check_equivalence(pipeline, kernel, random_features(100000))
+
+    print(f"{'years':>5} {'rows':>8} {'pipeline DataFrame, ms':>23} {'pipeline matrix, ms':>20} {'fused, ms':>10}")
+    for years, df in features.items():
+        times = [min(timeit.repeat(call, number=1, repeat=repeat)) * 1000 for call in
+                 [lambda: pipeline.predict(df[STAGE1_FEATURES]),
+                  lambda: pipeline.predict(get_feature_matrix(df, STAGE1_FEATURES)),
+                  lambda: kernel.predict(df)]]
+        print(f'{years:>5} {len(df):>8} {times[0]:>23.2f} {times[1]:>20.2f} {times[2]:>10.2f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Time to first paint and time to forecast of the Home page: the previous
+sequential startup (fetch the data, build the predictor, then draw the page)
+against the background warm-up of utils/warmup.py, which draws the page at
+once and loads the data, the reference files and both models in parallel.
+Every run starts in a fresh process, so module imports and model loads are
+included. The database is emulated by synthetic data returned after
+--db-latency seconds. Run from the repository root:
+
+    python -m benchmarks.bench_warmup --years 5 --db-latency 1.0
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+def measure(mode, data_path, db_latency):
+    import pandas as pd
+    #the app has streamlit imported before any of this runs
+    import streamlit
+    raw = pd.read_parquet(data_path)
+
+    def fetch_df():
+        time.sleep(db_latency)
+        return raw.copy()
+
+    started = time.perf_counter()
+    if mode == 'sequential':
+        from model.power_comsumption_predictor import PowerConsumptionPredictor
+        predictor = PowerConsumptionPredictor(fetch_df())
+        first_paint = time.perf_counter() - started
+    else:
+        from utils.warmup import Warmup
+
+        def build_predictor(df):
+            from model.power_comsumption_predictor import PowerConsumptionPredictor
+            return PowerConsumptionPredictor(df)
+
+        warmup = Warmup(fetch_df, build_predictor).start()
+        first_paint = time.perf_counter() - started
+        warmup.finished.wait()
+        if warmup.error is not None:
+            raise warmup.error
+        predictor = warmup.predictor
+    today = predictor.df.index[-1]
+    predictor.forecast_today(today, today)
+    return {'first_paint': first_paint, 'forecast': time.perf_counter() - started}
+
+def main():
+    parser = argparse.ArgumentParser(description='Home page startup: sequential against background warm-up')
+    parser.add_argument('--years', type=float, default=5)
+    parser.add_argument('--db-latency', type=float, default=1.0, help='seconds the emulated database takes to answer')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--run', choices=['sequential', 'warmup'], help=argparse.SUPPRESS)
+    parser.add_argument('--data', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run is not None:
+        print(json.dumps(measure(args.run, args.data, args.db_latency)))
+        return
+
+    #the data is generated here, the generator imports the predictor module, whose
+    #import time is part of the startup being measured
+    from benchmarks.synthetic import make_power_cons
+    with tempfile.TemporaryDirectory() as directory:
+        data_path = os.path.join(directory, 'power_cons.parquet')
+        make_power_cons(args.years).to_parquet(data_path)
+        print(f"{'mode':<11} {'first paint, s':>15} {'forecast, s':>12}")
+        for mode in ['sequential', 'warmup']:
+            runs = []
+            for _ in range(args.repeat):
+                output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_warmup', '--run', mode, '--data', data_path,
+                                         '--db-latency', str(args.db_latency)], capture_output=True, text=True, check=True).stdout
+                runs.append(json.loads(output.strip().splitlines()[-1]))
+            print(f"{mode:<11} {statistics.median(run['first_paint'] for run in runs):>15.2f} "
+                  f"{statistics.median(run['forecast'] for run in runs):>12.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Checks PowerConsumptionPredictor.backtest on synthetic data: the table is the
+same with the windows split over worker processes as in one process, and the
+metrics of every window equal those of evaluate() on the forecast of that
+window. Run from the repository root:
+
+    python -m benchmarks.check_backtest --years 2 --n-jobs 4
+"""
+import argparse
+import numpy as np
+import pandas as pd
+from benchmarks.run_suite import build_predictor
+from benchmarks.synthetic import make_power_cons
+
+def check_against_evaluate(pcp, table, horizon):
+    # The forecast of each window, scored by evaluate, gives the same metrics as the backtest row
+    for row in table.itertuples():
+        end = row.origin + pd.Timedelta(days=horizon - 1)
+        forecast = pcp.predict_second(pcp.df, row.origin, end, with_fact=True)
+        assert row.hours == len(forecast), f'{row.origin:%Y-%m-%d}: {row.hours} hours, the forecast has {len(forecast)}'
+        expected = pcp.evaluate(forecast['target'], forecast['predict'], 'backtest')
+        assert (row.mae, row.mape, row.r2) == expected, f'{row.origin:%Y-%m-%d}: {(row.mae, row.mape, row.r2)} != {expected}'
+
+def main():
+    parser = argparse.ArgumentParser(description='rolling-origin backtest checks')
+    parser.add_argument('--years', type=float, default=2)
+    parser.add_argument('--days', type=int, default=90, help='number of daily origins, counted back from the last day')
+    parser.add_argument('--n-jobs', type=int, default=4)
+    args = parser.parse_args()
+
+    pcp, _ = build_predictor(make_power_cons(args.years))
+    last = pcp.df['date'].iloc[-1]
+    for horizon in [1, 7]:
+        origins = pd.date_range(end=last - pd.Timedelta(days=horizon - 1), periods=args.days, freq='D')
+        serial = pcp.backtest(origins, horizon)
+        parallel = pcp.backtest(origins, horizon, n_jobs=args.n_jobs)
+        pd.testing.assert_frame_equal(parallel, serial, check_exact=True)
+        assert len(serial) == args.days and np.isfinite(serial[['mae', 'mape', 'r2']].to_numpy()).all()
+        check_against_evaluate(pcp, serial, horizon)
+        print(f'horizon {horizon} d: {len(serial)} windows, n_jobs=1 and n_jobs={args.n_jobs} give the same table, '
+              f'metrics match evaluate, mean MAE {serial["mae"].mean():.2f} MWh')
+
+if __name__ == '__main__':
+    main()
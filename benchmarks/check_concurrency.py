@@ -0,0 +1,63 @@
+"""
+Checks that one predictor can serve concurrent sessions: about 60 overlapping
+forecast_today and forecast_vs_fact ranges run on a thread pool must return
+the same frames as the same calls made one after another, and must leave
+pcp.df unchanged. Runs once with the result cache off and once with it on.
+Run from the repository root:
+
+    python -m benchmarks.check_concurrency --years 2 --workers 16
+"""
+import argparse
+import random
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from benchmarks.run_suite import build_predictor
+from benchmarks.synthetic import make_power_cons
+from model.power_comsumption_predictor import PowerConsumptionPredictor
+
+def make_calls(pcp, count, seed=0):
+    """
+    Returns (method, start, end) calls over the last two months of the history.
+    The ranges overlap and some of them repeat, so the cache gets hits too
+    """
+    rng = random.Random(seed)
+    last = pcp.df['date'].iloc[-1]
+    days = pd.date_range(last - pd.Timedelta(days=60), last, freq='D')
+    calls = []
+    for _ in range(count):
+        start = days[rng.randrange(len(days))]
+        end = min(start + pd.Timedelta(days=rng.choice([0, 1, 6, 13, 30])), last)
+        calls.append((rng.choice(['forecast_today', 'forecast_vs_fact']), start, end))
+    return calls + calls[:count // 5]
+
+def check(pcp, calls, workers):
+    df_before = pcp.df.copy()
+    expected = [getattr(pcp, method)(start, end) for method, start, end in calls]
+    pcp.clear_results()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        got = list(pool.map(lambda call: getattr(pcp, call[0])(call[1], call[2]), calls))
+    for (method, start, end), result, serial in zip(calls, got, expected):
+        try:
+            pd.testing.assert_frame_equal(result, serial, check_exact=True)
+        except AssertionError as error:
+            raise AssertionError(f'{method} {start:%Y-%m-%d}..{end:%Y-%m-%d} differs from the serial call') from error
+    pd.testing.assert_frame_equal(pcp.df, df_before, check_exact=True)
+
+def main():
+    parser = argparse.ArgumentParser(description='concurrent forecasts against serial ones')
+    parser.add_argument('--years', type=float, default=2)
+    parser.add_argument('--calls', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=16)
+    args = parser.parse_args()
+
+    raw = make_power_cons(args.years)
+    pcp, _ = build_predictor(raw)
+    calls = make_calls(pcp, args.calls)
+    for cache_size in [0, 64]:
+        predictor = PowerConsumptionPredictor(raw.copy(), pcp.lin_model, pcp.lgbm_model, result_cache_size=cache_size)
+        check(predictor, calls, args.workers)
+        print(f'result cache {cache_size}: {len(calls)} concurrent calls on {args.workers} threads '
+              'match the serial results, pcp.df unchanged')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Import time of every Streamlit entry point against its budget. Only the
+module-level imports of a page are measured, since nothing is drawn until
+they finish; imports made later, on the code paths that need them, are not
+counted. streamlit itself is imported beforehand, as the server has it
+loaded already. Each page is measured in fresh processes with
+python -X importtime. Run from the repository root:
+
+    python -m benchmarks.import_budget
+    python -m benchmarks.import_budget --check    # exit code 1 if a page is over budget
+"""
+import argparse
+import ast
+import glob
+import subprocess
+import sys
+
+#milliseconds of module-level imports per page, streamlit excluded
+BUDGETS_MS = {'Home.py': 150, 'Home_ru.py': 150,
+              'pages/1_Forecast.py': 150, 'pages/1_Forecast_ru.py': 150,
+              'pages/2_Archive.py': 150, 'pages/2_Archive_ru.py': 150,
+              'pages/3_About.py': 150, 'pages/3_About_ru.py': 150}
+
+MARK = 'import budget: page imports start'
+
+def get_entry_points():
+    return ['Home.py', 'Home_ru.py'] + sorted(glob.glob('pages/*.py'))
+
+def get_module_imports(path):
+    # Import statements at the top level of the page script
+    with open(path, encoding='utf-8') as file:
+        tree = ast.parse(file.read())
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+def measure_imports(imports):
+    """
+    Returns the import time of imports in milliseconds and the slowest modules:
+    the sum of the cumulative times of the modules they import directly
+    """
+    code = '\n'.join(['import sys', 'import streamlit', f'sys.stderr.write({MARK!r} + "\\n")', *imports])
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True, check=True).stderr
+    lines = stderr.split(MARK, 1)[1].splitlines()
+    modules = {}
+    for line in lines:
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        #nested imports are indented under the module that imported them
+        if not name.startswith('  ', 1):
+            modules[name.strip()] = int(cumulative) / 1000
+    return sum(modules.values()), sorted(modules.items(), key=lambda item: -item[1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Module-level import time of the Streamlit pages')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--check', action='store_true', help='exit with code 1 if a page is over its budget')
+    args = parser.parse_args()
+
+    over = []
+    print(f"{'page':<24} {'imports, ms':>12} {'budget, ms':>11}  slowest")
+    for page in get_entry_points():
+        imports = get_module_imports(page)
+        runs = [measure_imports(imports) for _ in range(args.repeat)]
+        total, modules = min(runs, key=lambda run: run[0])
+        budget = BUDGETS_MS.get(page)
+        slowest = ', '.join(f'{name} {ms:.0f}' for name, ms in modules[:3])
+        print(f"{page:<24} {total:>12.0f} {budget if budget is not None else '-':>11}  {slowest}")
+        if budget is not None and total > budget:
+            over.append(page)
+
+    if over:
+        print(f"over budget: {', '.join(over)}")
+        if args.check:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
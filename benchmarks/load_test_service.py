@@ -0,0 +1,111 @@
+"""
+Latency and throughput load test of service/forecast_service.py. By default
+it starts the service in this process on synthetic data, so no database is
+needed, and checks its answers against the predictor before timing. Run from
+the repository root:
+
+    python -m benchmarks.load_test_service --requests 2000 --concurrency 1 8 32
+    python -m benchmarks.load_test_service --url http://127.0.0.1:8000
+
+Each request asks for a forecast_vs_fact range of 1 to 7 days picked at random
+from the data, or for today's forecast with --endpoint today
+"""
+import argparse
+import http.client
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import numpy as np
+import pandas as pd
+from benchmarks.run_suite import build_predictor
+from benchmarks.synthetic import make_power_cons
+from service.forecast_service import make_server
+
+def make_paths(endpoint, first_date, last_date, count, seed=0):
+    if endpoint == 'today':
+        return ['/forecast/today'] * count
+    rng = np.random.default_rng(seed)
+    days = (pd.Timestamp(last_date) - pd.Timestamp(first_date)).days
+    paths = []
+    for start, length in zip(rng.integers(7, days - 7, count), rng.integers(0, 7, count)):
+        start_date = pd.Timestamp(first_date) + pd.Timedelta(days=int(start))
+        end_date = start_date + pd.Timedelta(days=int(length))
+        paths.append(f"/forecast/vs_fact?start={start_date:%Y-%m-%d}&end={end_date:%Y-%m-%d}")
+    return paths
+
+def check_answers(url, predictor):
+    """
+    Compares a JSON and a CSV answer of the service with the predictor's own output
+    """
+    connection = http.client.HTTPConnection(url.hostname, url.port)
+    expected = predictor.forecast_vs_fact('2019-06-01', '2019-06-03')
+    for output_format in ['json', 'csv']:
+        connection.request('GET', f'/forecast/vs_fact?start=2019-06-01&end=2019-06-03&format={output_format}')
+        body = connection.getresponse().read().decode('utf-8')
+        got = pd.read_json(io.StringIO(body), convert_dates=False) if output_format == 'json' else pd.read_csv(io.StringIO(body))
+        pd.testing.assert_frame_equal(got, expected, check_exact=False, rtol=1e-6)
+    connection.close()
+
+def run_load(url, paths, concurrency):
+    """
+    Sends the requests from concurrency client threads, each over its own keep-alive
+    connection, and returns the latencies in seconds and the total wall time
+    """
+    local = threading.local()
+
+    def send(path):
+        if not hasattr(local, 'connection'):
+            local.connection = http.client.HTTPConnection(url.hostname, url.port)
+        start = time.perf_counter()
+        local.connection.request('GET', path)
+        response = local.connection.getresponse()
+        response.read()
+        if response.status != 200:
+            raise RuntimeError(f'{path} returned {response.status}')
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(send, paths))
+    return latencies, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the forecast service')
+    parser.add_argument('--url', help='test a running service instead of starting one on synthetic data')
+    parser.add_argument('--years', type=float, default=2, help='years of synthetic data for the in-process service')
+    parser.add_argument('--endpoint', choices=['vs_fact', 'today'], default='vs_fact')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    args = parser.parse_args()
+
+    server = None
+    if args.url is None:
+        predictor, _ = build_predictor(make_power_cons(args.years))
+        server = make_server(predictor, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = urlparse(f'http://127.0.0.1:{server.server_address[1]}')
+        check_answers(url, predictor)
+        print('service answers match the predictor')
+    else:
+        url = urlparse(args.url)
+
+    connection = http.client.HTTPConnection(url.hostname, url.port)
+    connection.request('GET', '/health')
+    health = pd.read_json(io.StringIO(connection.getresponse().read().decode('utf-8')), typ='series')
+    connection.close()
+    paths = make_paths(args.endpoint, health['first_date'], health['last_date'], args.requests)
+
+    print(f"{'clients':>7} {'requests/s':>11} {'p50, ms':>8} {'p95, ms':>8} {'p99, ms':>8}")
+    for concurrency in args.concurrency:
+        latencies, seconds = run_load(url, paths, concurrency)
+        p50, p95, p99 = (np.percentile(latencies, q) * 1000 for q in [50, 95, 99])
+        print(f'{concurrency:>7} {len(paths) / seconds:>11.0f} {p50:>8.2f} {p95:>8.2f} {p99:>8.2f}')
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Offline benchmark suite. Times predictor construction, every preprocessing stage,
+predict_first, predict_second and to_excel on synthetic power_cons data of
+several lengths and writes the results as JSON, so runs of different versions
+can be compared. Run from the repository root:
+
+    python -m benchmarks.run_suite --years 1 5 20 --output results.json
+    python -m benchmarks.run_suite --years 1 5 20 --compare results.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import make_power_cons, fit_stand_in_stage2
+from model.power_comsumption_predictor import PowerConsumptionPredictor
+from model.model_registry import has_model
+from utils.excel_saver import to_excel
+
+#the add_* stages in the order preprocess runs them
+PREPROCESS_STAGES = ['add_calendar_features', 'add_lags', 'add_day_features', 'add_weather_and_daylight',
+                     'add_daysoff', 'add_sin_cos_time']
+
+def measure(function, make_args, repeat):
+    """
+    Calls function(*make_args()) repeat times and returns the wall times in seconds.
+    Arguments are rebuilt before every call and not timed, as the stages modify them
+    """
+    times = []
+    for _ in range(repeat):
+        args = make_args()
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return times
+
+def build_predictor(raw):
+    """
+    Builds a predictor with the shipped models. When the stage 2 model is not
+    present, a stand-in fitted on the data is injected instead
+    """
+    pcp = PowerConsumptionPredictor(raw.copy())
+    if has_model('stage2'):
+        return pcp, True
+    pcp.lgbm_model = fit_stand_in_stage2(pcp.df)
+    return pcp, False
+
+def run_years(years, repeat):
+    raw = make_power_cons(years)
+    pcp, shipped_models = build_predictor(raw)
+    results = {}
+
+    results['__init__'] = measure(PowerConsumptionPredictor, lambda: (raw.copy(),), repeat)
+    results['preprocess'] = measure(pcp.preprocess, lambda: (raw.copy(),), repeat)
+
+    #feed every stage the output of the previous one, as preprocess does
+    df = raw.ffill()
+    for stage in PREPROCESS_STAGES:
+        results[stage] = measure(getattr(pcp, stage), lambda: (df.copy(),), repeat)
+        df = getattr(pcp, stage)(df.copy())
+
+    features = pcp.preprocess(raw.copy())
+    results['predict_first'] = measure(pcp.predict_first, lambda: (features,), repeat)
+
+    last_day = pcp.df['date'].iloc[-1]
+    week_start = last_day - pd.Timedelta(days=6)
+    results['predict_second_1d'] = measure(pcp.predict_second, lambda: (pcp.df, last_day, last_day), repeat)
+    results['predict_second_7d'] = measure(pcp.predict_second, lambda: (pcp.df, week_start, last_day), repeat)
+
+    month = pcp.forecast_vs_fact(last_day - pd.Timedelta(days=29), last_day)
+    results['to_excel_30d'] = measure(to_excel, lambda: (month,), repeat)
+
+    return [{'years': years, 'rows': len(raw), 'stage': stage, 'repeat': repeat, 'shipped_models': shipped_models,
+             'min_s': min(times), 'median_s': statistics.median(times)} for stage, times in results.items()]
+
+def get_meta():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': commit, 'python': platform.python_version(),
+            'platform': platform.platform(), 'pandas': pd.__version__, 'numpy': np.__version__}
+
+def print_results(results, baseline=None):
+    previous = {}
+    if baseline is not None:
+        previous = {(row['years'], row['stage']): row['min_s'] for row in baseline['results']}
+    print(f"{'years':>5} {'stage':<26} {'min, ms':>10} {'median, ms':>11}" + (f" {'vs baseline':>12}" if previous else ''))
+    for row in results:
+        line = f"{row['years']:>5g} {row['stage']:<26} {row['min_s'] * 1000:>10.2f} {row['median_s'] * 1000:>11.2f}"
+        if (row['years'], row['stage']) in previous:
+            line += f" {previous[(row['years'], row['stage'])] / row['min_s']:>11.2f}x"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the predictor on synthetic power_cons data')
+    parser.add_argument('--years', type=float, nargs='+', default=[1, 5, 20], help='history lengths, 1 to 30 years')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file of an earlier run to compare with')
+    args = parser.parse_args()
+
+    results = []
+    for years in args.years:
+        results.extend(run_years(years, args.repeat))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'meta': get_meta(), 'results': results}, file, indent=2)
+
+if __name__ == '__main__':
+    main()
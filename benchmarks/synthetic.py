@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+from model.power_comsumption_predictor import STAGE2_FEATURES
+
+#forecast strings in the style of the power_cons weather_pred column. cold hours
+#(below +1 °C) draw from the first list, the rest from the second one
+COLD_WEATHER = ['ясно', 'ясно, мороз', 'малообл', 'малообл, ветер', 'обл с пр', 'пасм',
+                'пасм, ветер', 'пасм, снег', 'пасм, небольшой снег', 'обл с пр, снег',
+                'снег, метель', 'пасм, мокрый снег', 'пасм, снег с дождем', 'пасм, туман',
+                'ясно, местами обл', 'пасм, шторм', 'ветер, шторм']
+WARM_WEATHER = ['ясно', 'ясно, ветер', 'малообл', 'малообл, ветер', 'обл с пр', 'обл, дождь',
+                'пасм', 'пасм, ветер', 'пасм, дождь', 'пасм, морось', 'пасм, небольшой дождь',
+                'обл с пр, ливневый дождь', 'ливень', 'гроза', 'дождь, гроз', 'пасм, гроза',
+                'ясно, туман', 'ясно, местами обл', 'малообл, сильный ветер', 'шторм']
+WEATHER_STRINGS = sorted(set(COLD_WEATHER + WARM_WEATHER))
+
+def make_power_cons(years=1, start='2019-01-01', seed=0):
+    """
+    Returns a deterministic synthetic frame shaped like the power_cons table:
+    one row per hour with date, time, target, temp_pred, weather_pred and temp.
+    years may be fractional, 1 to 30 years take well under a second
+    """
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(start, periods=int(round(365.25 * years)), freq='D')
+    n = len(days) * 24
+    hours = np.arange(n)
+
+    #yearly and daily cycles plus noise
+    temp = 8 - 12 * np.cos(2 * np.pi * hours / (24 * 365.25)) - 4 * np.cos(2 * np.pi * (hours % 24) / 24) + rng.normal(0, 2, n)
+    target = (480 + 60 * np.sin(2 * np.pi * ((hours % 24) - 6) / 24) + 40 * np.cos(2 * np.pi * hours / (24 * 365.25))
+              - 1.5 * temp + rng.normal(0, 8, n))
+    temp_pred = np.round(temp + rng.normal(0, 1.5, n))
+
+    #weather forecasts are issued for 3-hour blocks and depend on the season
+    blocks = np.arange(n) // 3
+    cold = np.repeat(temp_pred[::3] < 1, 3)[:n]
+    cold_pick = np.array(COLD_WEATHER, dtype=object)[rng.integers(0, len(COLD_WEATHER), blocks[-1] + 1)][blocks]
+    warm_pick = np.array(WARM_WEATHER, dtype=object)[rng.integers(0, len(WARM_WEATHER), blocks[-1] + 1)][blocks]
+
+    return pd.DataFrame({'date': np.repeat(days.strftime('%Y-%m-%d').to_numpy(), 24),
+                         'time': np.tile(np.arange(24), len(days)),
+                         'target': np.round(target, 3),
+                         'temp_pred': temp_pred,
+                         'weather_pred': np.where(cold, cold_pick, warm_pick),
+                         'temp': np.round(temp, 1)})
+
+def fit_stand_in_stage2(scored, num_boost_round=200):
+    """
+    Fits a small LightGBM booster on the stage-1 error of a scored synthetic frame.
+    model/model2.pkl is not shipped with the repository, the stand-in has the same
+    feature set and lets the benchmarks exercise the stage 2 code paths
+    """
+    import lightgbm
+    dataset = lightgbm.Dataset(scored[STAGE2_FEATURES], scored['stage1_error'])
+    return lightgbm.train({'num_leaves': 63, 'learning_rate': 0.05, 'verbose': -1}, dataset, num_boost_round)
@@ -0,0 +1,123 @@
+import logging
+import os
+import threading
+import pandas as pd
+from model.instrumentation import stage
+
+#one subdirectory per model version, see model_registry.get_model_version
+ARCHIVE_DIR = os.environ.get('POWER_FORECAST_ARCHIVE_DIR',
+                             os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'archive'))
+#rows per parquet row group: a month of hours, so a range scan skips the other months of a part
+ROW_GROUP_ROWS = 24 * 31
+
+logger = logging.getLogger('power_consumption.archive')
+
+class ForecastArchive():
+    """
+    Архив прогнозов с фактом за все закрытые дни истории для одной версии моделей.
+    Прогноз прошлого дня при тех же моделях не меняется, поэтому он считается один раз
+    и хранится в parquet. Каждое обновление дописывает только новые закрытые дни
+    отдельным файлом part, имя которого содержит его первый и последний день, так что
+    чтение периода открывает только пересекающиеся файлы
+    """
+    def __init__(self, model_version, archive_dir=ARCHIVE_DIR):
+        self.model_version = model_version
+        self.path = os.path.join(archive_dir, model_version)
+        self.lock = threading.Lock()
+        self.parts = self.list_parts()
+        #row group bounds by part path, parts are never rewritten
+        self.row_groups = {}
+
+    def list_parts(self):
+        #[(path, first day, last day)] sorted by day. files being written start with a dot
+        if not os.path.isdir(self.path):
+            return []
+        parts = []
+        for name in os.listdir(self.path):
+            if name.endswith('.parquet') and not name.startswith('.'):
+                first, last = name[:-len('.parquet')].split('_')
+                parts.append((os.path.join(self.path, name), pd.Timestamp(first), pd.Timestamp(last)))
+        return sorted(parts, key=lambda part: part[1])
+
+    @property
+    def bounds(self):
+        """
+        Первый и последний день архива или None, если он пуст
+        """
+        parts = self.parts
+        if not parts:
+            return None
+        return parts[0][1], parts[-1][2]
+
+    def covers(self, start_date, end_date):
+        bounds = self.bounds
+        return (bounds is not None and bounds[0] <= pd.Timestamp(start_date).normalize()
+                and pd.Timestamp(end_date).normalize() <= bounds[1])
+
+    def update(self, predictor):
+        """
+        Функция дописывает в архив прогнозы predictor для дней, закрытых после последнего
+        обновления. Последний день данных еще открыт: это "сегодня" страницы прогноза.
+        Возвращает число добавленных строк. Если каталог архива недоступен для записи,
+        архив остается прежним, а прогнозы считаются моделями как раньше
+        """
+        index = predictor.df.index
+        if len(index) == 0:
+            return 0
+        with self.lock:
+            bounds = self.bounds
+            first = index[0].normalize() if bounds is None else bounds[1] + pd.Timedelta(days=1)
+            last = index[-1].normalize() - pd.Timedelta(days=1)
+            if first > last:
+                return 0
+            with stage('update_archive') as record:
+                forecast = predictor.predict_second(predictor.df, first, last, with_fact=True)
+                forecast['datetime'] = pd.to_datetime(forecast['datetime'])
+                name = f'{first:%Y-%m-%d}_{last:%Y-%m-%d}.parquet'
+                try:
+                    os.makedirs(self.path, exist_ok=True)
+                    #readers never see a half-written part
+                    temporary = os.path.join(self.path, f'.{name}.{os.getpid()}')
+                    forecast.to_parquet(temporary, index=False, row_group_size=ROW_GROUP_ROWS)
+                    os.replace(temporary, os.path.join(self.path, name))
+                except OSError as error:
+                    logger.warning('forecast archive %s was not updated: %s', self.path, error)
+                    return 0
+                record['rows'] = len(forecast)
+            self.parts = self.list_parts()
+        return len(forecast)
+
+    def get_row_groups(self, path):
+        #first and last hour of every row group of a part, from the parquet footer
+        if path not in self.row_groups:
+            import pyarrow.parquet as pq
+            metadata = pq.ParquetFile(path).metadata
+            column = metadata.schema.names.index('datetime')
+            self.row_groups[path] = [(pd.Timestamp(metadata.row_group(i).column(column).statistics.min),
+                                      pd.Timestamp(metadata.row_group(i).column(column).statistics.max))
+                                     for i in range(metadata.num_row_groups)]
+        return self.row_groups[path]
+
+    def read(self, start_date, end_date):
+        """
+        Функция возвращает архивные прогнозы с фактом с start_date по end_date включительно
+        в том же виде, что и PowerConsumptionPredictor.forecast_vs_fact. Читаются только
+        группы строк, пересекающие период
+        """
+        import pyarrow.parquet as pq
+        start = pd.Timestamp(start_date).normalize()
+        end = pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)
+        with stage('read_archive') as record:
+            frames = []
+            for path, first, last in self.parts:
+                if first < end and last >= start:
+                    groups = [i for i, (low, high) in enumerate(self.get_row_groups(path)) if low < end and high >= start]
+                    frames.append(pq.ParquetFile(path).read_row_groups(groups).to_pandas())
+            if not frames:
+                return pd.DataFrame({'datetime': pd.Series(dtype=object), 'predict': pd.Series(dtype='float64'),
+                                     'target': pd.Series(dtype='float64')})
+            df = pd.concat(frames, ignore_index=True)
+            df = df[(df['datetime'] >= start) & (df['datetime'] < end)].sort_values('datetime', kind='stable', ignore_index=True)
+            df['datetime'] = df['datetime'].dt.strftime('%Y-%m-%d %H:%M:%S')
+            record['rows'] = len(df)
+        return df
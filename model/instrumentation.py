@@ -0,0 +1,143 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+logger = logging.getLogger('power_consumption.instrumentation')
+
+#peak memory per stage needs tracemalloc, which slows the app down noticeably,
+#so it is only switched on by POWER_FORECAST_TRACE_MEMORY=1 or enable_memory_tracing()
+def enable_memory_tracing():
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+if os.environ.get('POWER_FORECAST_TRACE_MEMORY') == '1':
+    enable_memory_tracing()
+
+class Counters():
+    """
+    Накопительные счетчики процесса для внешнего сборщика метрик: по каждому этапу и
+    вызову - число вызовов, суммарное время, суммарное число строк и максимальный пик
+    памяти, а также простые счетчики событий
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.events = {}
+
+    def add(self, kind, name, seconds, rows=None, peak_bytes=None):
+        with self.lock:
+            counter = self.timings.setdefault((kind, name), {'calls_total': 0, 'seconds_total': 0.0, 'rows_total': 0, 'peak_bytes_max': 0})
+            counter['calls_total'] += 1
+            counter['seconds_total'] += seconds
+            counter['rows_total'] += rows or 0
+            counter['peak_bytes_max'] = max(counter['peak_bytes_max'], peak_bytes or 0)
+
+    def increment(self, name, value=1):
+        with self.lock:
+            self.events[name] = self.events.get(name, 0) + value
+
+    def snapshot(self):
+        """
+        Функция возвращает копию счетчиков в виде {'stage': {...}, 'trace': {...}, 'events': {...}}
+        """
+        with self.lock:
+            snapshot = {'stage': {}, 'trace': {}, 'events': dict(self.events)}
+            for (kind, name), counter in self.timings.items():
+                snapshot[kind][name] = dict(counter)
+        return snapshot
+
+    def render_prometheus(self, prefix='power_forecast'):
+        """
+        Функция возвращает счетчики в текстовом формате Prometheus
+        """
+        snapshot = self.snapshot()
+        lines = []
+        for kind in ['stage', 'trace']:
+            for name, counter in sorted(snapshot[kind].items()):
+                for field, value in counter.items():
+                    lines.append(f'{prefix}_{kind}_{field}{{{kind}="{name}"}} {value}')
+        for name, value in sorted(snapshot['events'].items()):
+            lines.append(f'{prefix}_{name}_total {value}')
+        return '\n'.join(lines) + '\n'
+
+COUNTERS = Counters()
+
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+#running peak of the innermost open stage, see stage()
+_current_peak = contextvars.ContextVar('current_peak', default=None)
+
+class Trace():
+    """
+    Запись одного вызова (построения предиктора, прогноза, отрисовки страницы):
+    время, число строк и пик памяти по каждому выполненному внутри этапу
+    """
+    def __init__(self, name, parent=None, **attrs):
+        self.name = name
+        self.parent = parent
+        self.attrs = attrs
+        self.stages = []
+        self.started = time.time()
+        self.seconds = None
+
+    def to_record(self):
+        return {'trace': self.name, 'started': self.started, 'seconds': self.seconds, 'stages': self.stages, **self.attrs}
+
+@contextmanager
+def trace(name, **attrs):
+    """
+    Функция открывает запись вызова. Этапы, выполненные внутри, попадают в нее и во все
+    объемлющие записи. По завершении запись выводится в лог одной строкой JSON
+    :param name: имя вызова
+    :param attrs: дополнительные поля записи, например даты прогноза
+    """
+    current = Trace(name, _current_trace.get(), **attrs)
+    token = _current_trace.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.seconds = time.perf_counter() - start
+        _current_trace.reset(token)
+        COUNTERS.add('trace', name, current.seconds)
+        logger.info(json.dumps(current.to_record(), default=str))
+
+@contextmanager
+def stage(name):
+    """
+    Функция замеряет один этап. Число строк результата задается внутри блока через
+    record['rows']. Пик памяти пишется, только если включен tracemalloc. Пик вложенного
+    этапа входит и в пик объемлющего
+    """
+    record = {'stage': name, 'rows': None, 'seconds': None, 'peak_bytes': None}
+    tracing_memory = tracemalloc.is_tracing()
+    if tracing_memory:
+        #reset_peak erases the peak of the enclosing stage, so it is folded into
+        #the enclosing stage's running peak first
+        parent = _current_peak.get()
+        if parent is not None:
+            parent['peak'] = max(parent['peak'], tracemalloc.get_traced_memory()[1])
+        #the peak is process-wide, so stages running in parallel threads share it
+        tracemalloc.reset_peak()
+        peak_token = _current_peak.set({'peak': 0})
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        if tracing_memory:
+            #own peak since the last nested stage ended, or the peaks of the nested stages
+            record['peak_bytes'] = max(tracemalloc.get_traced_memory()[1], _current_peak.get()['peak'])
+            _current_peak.reset(peak_token)
+            if parent is not None:
+                parent['peak'] = max(parent['peak'], record['peak_bytes'])
+        COUNTERS.add('stage', name, record['seconds'], record['rows'], record['peak_bytes'])
+        #add the stage to the open trace and to the traces it is nested in
+        current = _current_trace.get()
+        while current is not None:
+            current.stages.append(record)
+            current = current.parent
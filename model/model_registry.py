@@ -0,0 +1,172 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+from importlib import metadata
+from model.instrumentation import stage
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+
+logger = logging.getLogger('power_consumption.models')
+
+class ModelArtifactError(Exception):
+    """
+    Файл модели отсутствует, поврежден или не соответствует манифесту
+    """
+
+def load_manifest(model_dir=MODEL_DIR):
+    """
+    Функция читает manifest.json: версию набора моделей и для каждой модели ее файлы
+    в порядке предпочтения с форматом и контрольной суммой sha256 (null - не проверяется)
+    """
+    with open(os.path.join(model_dir, 'manifest.json'), encoding='utf-8') as file:
+        return json.load(file)
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def find_artifact(name, model_dir=MODEL_DIR):
+    """
+    Функция возвращает описание первого существующего файла модели name из манифеста
+    с абсолютным путем. Если ни одного файла нет, бросает ModelArtifactError
+    """
+    artifacts = load_manifest(model_dir)['artifacts']
+    if name not in artifacts:
+        raise ModelArtifactError(f'unknown model {name!r}, model/manifest.json lists {sorted(artifacts)}')
+    artifact = artifacts[name]
+    for entry in artifact['files']:
+        path = os.path.join(model_dir, entry['path'])
+        if os.path.exists(path):
+            return dict(entry, path=path)
+    expected = ' or '.join(os.path.join(model_dir, entry['path']) for entry in artifact['files'])
+    raise ModelArtifactError(f"{name} model ({artifact['description']}) not found, expected {expected}")
+
+def has_model(name, model_dir=MODEL_DIR):
+    try:
+        find_artifact(name, model_dir)
+        return True
+    except ModelArtifactError:
+        return False
+
+def read_model(name, model_dir=MODEL_DIR):
+    """
+    Функция читает модель name с проверкой контрольной суммы. Бустер LightGBM в формате
+    lightgbm читается из его текстового описания без unpickling
+    """
+    entry = find_artifact(name, model_dir)
+    if entry['sha256'] is None:
+        logger.warning("%s has no sha256 in model/manifest.json and is loaded unchecked. "
+                       "Record it with python -m model.model_registry --export-stage2", entry['path'])
+    else:
+        actual = file_sha256(entry['path'])
+        if actual != entry['sha256']:
+            raise ModelArtifactError(f"{entry['path']} has sha256 {actual}, model/manifest.json expects {entry['sha256']}. "
+                                     "The file is damaged or was replaced without updating the manifest")
+
+    #pickles made by another library version may load but predict differently
+    for package, version in load_manifest(model_dir)['artifacts'][name].get('requires', {}).items():
+        try:
+            installed = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            raise ModelArtifactError(f'{name} model needs {package}=={version}, which is not installed')
+        if installed != version:
+            logger.warning('%s model was saved with %s %s, %s is installed', name, package, version, installed)
+
+    with stage(f'load_{name}'):
+        if entry['format'] == 'lightgbm':
+            import lightgbm
+            return lightgbm.Booster(model_file=entry['path'])
+        if entry['format'] == 'pickle':
+            with open(entry['path'], 'rb') as file:
+                return pickle.load(file)
+    raise ModelArtifactError(f"{entry['path']} has unknown format {entry['format']!r}")
+
+def set_checksum(name, path, model_dir=MODEL_DIR):
+    """
+    Функция записывает в manifest.json контрольную сумму файла path модели name
+    и возвращает ее
+    """
+    manifest = load_manifest(model_dir)
+    checksum = file_sha256(os.path.join(model_dir, path))
+    for entry in manifest['artifacts'][name]['files']:
+        if entry['path'] == path:
+            entry['sha256'] = checksum
+    manifest_path = os.path.join(model_dir, 'manifest.json')
+    temporary = f'{manifest_path}.{os.getpid()}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2, ensure_ascii=False)
+        file.write('\n')
+    os.replace(temporary, manifest_path)
+    return checksum
+
+def get_model_version(model_dir=MODEL_DIR):
+    """
+    Функция возвращает версию набора моделей: версию из манифеста и начало sha256 файлов,
+    которые будут прочитаны. Замена файла модели без правки манифеста тоже меняет версию
+    """
+    manifest = load_manifest(model_dir)
+    digest = hashlib.sha256()
+    for name in sorted(manifest['artifacts']):
+        digest.update(file_sha256(find_artifact(name, model_dir)['path']).encode('ascii'))
+    return f"{manifest['version']}-{digest.hexdigest()[:12]}"
+
+_cache = {}
+#a lock per model guards its loading, _lock only guards the dict of locks,
+#so different models load in parallel threads
+_locks = {}
+_lock = threading.Lock()
+
+def get_model(name, model_dir=MODEL_DIR):
+    """
+    Функция возвращает модель name, общую для всего процесса. Файл читается и проверяется
+    один раз, все предикторы получают один и тот же объект. Разные модели загружаются
+    параллельно, повторный запрос той же модели ждет окончания ее загрузки
+    """
+    key = (model_dir, name)
+    with _lock:
+        lock = _locks.setdefault(key, threading.Lock())
+    with lock:
+        if key not in _cache:
+            _cache[key] = read_model(name, model_dir)
+        return _cache[key]
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the model files against model/manifest.json')
+    parser.add_argument('--export-stage2', action='store_true',
+                        help='save the stage 2 booster as LightGBM model text to model/model2.txt '
+                        'and record its sha256 in model/manifest.json')
+    args = parser.parse_args()
+
+    manifest = load_manifest()
+    print(f"models version {manifest['version']}")
+    if all(has_model(name) for name in manifest['artifacts']):
+        print(f'models version with file checksums {get_model_version()}')
+    for name in manifest['artifacts']:
+        try:
+            entry = find_artifact(name)
+            get_model(name)
+            print(f"{name}: {entry['path']} ({entry['format']}), sha256 {file_sha256(entry['path'])}")
+        except ModelArtifactError as error:
+            print(f'{name}: {error}')
+
+    if args.export_stage2:
+        source = find_artifact('stage2')
+        path = os.path.join(MODEL_DIR, 'model2.txt')
+        #a pickled LGBMRegressor keeps its booster in booster_
+        booster = getattr(get_model('stage2'), 'booster_', get_model('stage2'))
+        booster.save_model(path)
+        #the file exported from is trusted by this run, so an unchecked source gets its checksum too
+        if source['sha256'] is None and os.path.basename(source['path']) != 'model2.txt':
+            print(f"recorded sha256 {set_checksum('stage2', os.path.basename(source['path']))} "
+                  f"of {source['path']} in model/manifest.json")
+        print(f"saved {path}, recorded sha256 {set_checksum('stage2', 'model2.txt')} in model/manifest.json")
+
+if __name__ == '__main__':
+    main()
@@ -1,37 +1,219 @@
 import pandas as pd
 import numpy as np
-import pickle
-from sklearn.metrics import mean_absolute_error, mean_absolute_percentage_error, r2_score
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from model.reference_data import get_reference_data
+from model.instrumentation import trace, stage, COUNTERS
+from model.model_registry import get_model
 import warnings
 warnings.filterwarnings("ignore")
 
+#storage types of the preprocessed features: flags and calendar parts as small ints,
+#which hold them exactly. every float feature a model reads keeps float64: a float32
+#temperature widened back to float64 is a different number and crosses stage 2 tree
+#thresholds. only the float statistics no model reads are stored as float32.
+#school_vac stays float because days missing from the vacations table are NaN
+FEATURE_SCHEMA = {'time': 'int8', 'dow': 'int8', 'day': 'int8', 'week': 'int8', 'month': 'int8',
+                  'jan': 'int8', 'feb': 'int8', 'mar': 'int8', 'apr': 'int8', 'may': 'int8', 'jun': 'int8',
+                  'jul': 'int8', 'aug': 'int8', 'sep': 'int8', 'oct': 'int8', 'nov': 'int8', 'dec': 'int8',
+                  'dayoff': 'int8', 'school_vac': 'float64', 'dark_weather': 'int8', 'working_hour': 'int8',
+                  'temp_pred': 'float64', 'yesterday_mean_temp': 'float64', 'yesterday_median_temp': 'float32',
+                  'yesterday_max_temp': 'float32', 'yesterday_min_temp': 'float32', 'yesterday_diff_temp': 'float64',
+                  'temp_lag_1': 'float64', 'temp_lag_2': 'float64', 'temp_lag_3': 'float64', 'temp_lag_4': 'float64',
+                  'cos_time': 'float64', 'sin_time': 'float32'}
+
+#names of the month one-hot columns
+MONTHS = {1: 'jan', 2: 'feb', 3: 'mar', 4: 'apr', 5: 'may', 6: 'jun',
+          7: 'jul', 8: 'aug', 9: 'sep', 10: 'oct', 11: 'nov', 12: 'dec'}
+
+#features of the linear (stage 1) and gradient boosting (stage 2) models, in training order
+STAGE1_FEATURES = ['target_lag_24', 'target_lag_96', 'target_lag_120', 'target_lag_144', 'target_lag_168', 'temp_pred', 'dow', 
+                   'day', 'week', 'jan', 'feb', 'mar', 'apr', 'may', 'jun',
+                   'jul', 'aug', 'sep', 'oct', 'nov', 'dec', 'cos_time', 'working_hour', 'dark_weather', 'yesterday_diff_temp']
+STAGE2_FEATURES = ['target_lag_24', 'target_lag_48', 'target_lag_72', 'target_lag_96', 'target_lag_120', 'target_lag_144', 'target_lag_168', 'target_lag_25',
+                   'target_lag_26', 'target_lag_49', 'temp_pred', 'dow', 'day', 'month', 'time', 'yesterday_median_target', 'yesterday_mean_temp',
+                   'dayoff', 'dark_weather', 'temp_lag_1', 'temp_lag_2', 'temp_lag_3', 'temp_lag_4', 'school_vac']
+
+def get_feature_matrix(df, features):
+    """
+    Функция возвращает признаки features в порядке обучения моделей как непрерывный
+    массив float64, который передается моделям без датафреймов и проверок имен колонок.
+    В float32 лаги target пересекают пороги деревьев второй модели и меняют прогноз,
+    а StandardScaler первой модели считает в типе входа
+    """
+    return np.ascontiguousarray(df[features].to_numpy(dtype='float64'))
+
+def predict_booster(lgbm_model, X, num_threads=None):
+    """
+    Функция вызывает бустер LightGBM напрямую на массиве NumPy. Модель, сохраненная как
+    LGBMRegressor, хранит бустер в booster_
+    :param num_threads: число потоков LightGBM, None - значение по умолчанию
+    """
+    booster = getattr(lgbm_model, 'booster_', lgbm_model)
+    if num_threads is None:
+        return booster.predict(X)
+    return booster.predict(X, num_threads=num_threads)
+
+class FusedLinearModel():
+    """
+    Первая модель (StandardScaler + Lasso), свернутая в одно линейное ядро NumPy. Масштабирование
+    внесено в коэффициенты, признаки с нулевыми коэффициентами отброшены, а one-hot месяца
+    заменен свободным членом для каждого месяца, который выбирается по столбцу month
+    """
+    def __init__(self, pipeline, features=STAGE1_FEATURES):
+        scaler, lasso = pipeline[0], pipeline[-1]
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(len(features))
+        scale = scaler.scale_ if scaler.with_std else np.ones(len(features))
+        #(x - mean) / scale * coef + intercept == x * (coef / scale) + (intercept - sum(mean * coef / scale))
+        weights = lasso.coef_ / scale
+        intercept = lasso.intercept_ - np.sum(mean * weights)
+
+        #index 0 is unused, so that the month number is the position
+        self.month_intercepts = np.full(13, intercept)
+        for month, name in MONTHS.items():
+            self.month_intercepts[month] += weights[features.index(name)]
+        kept = [i for i, feature in enumerate(features) if weights[i] != 0 and feature not in MONTHS.values()]
+        self.features = [features[i] for i in kept]
+        self.weights = weights[kept]
+
+    def predict(self, df):
+        return get_feature_matrix(df, self.features) @ self.weights + self.month_intercepts[df['month'].to_numpy()]
+
+def fuse_stage1(lin_model):
+    """
+    Функция сворачивает модель первого этапа в FusedLinearModel, если это конвейер из
+    StandardScaler и линейной модели над STAGE1_FEATURES, иначе возвращает None
+    """
+    #sklearn is imported where it is used, it is the slowest import of the app
+    from sklearn.preprocessing import StandardScaler
+    steps = getattr(lin_model, 'steps', [])
+    if (len(steps) == 2 and isinstance(steps[0][1], StandardScaler) and np.ndim(getattr(steps[1][1], 'coef_', None)) == 1
+            and len(steps[1][1].coef_) == len(STAGE1_FEATURES)):
+        return FusedLinearModel(lin_model)
+    return None
+
+def score_windows(lgbm_model, X, stage1_predict, y_true, origins, bounds):
+    """
+    Функция прогнозирует ошибку первой модели для строк нескольких окон одним вызовом
+    второй модели и считает метрики по каждому окну. Вынесена на уровень модуля, чтобы
+    ее можно было запускать в отдельных процессах
+    :param X: признаки второй модели для строк всех окон подряд
+    :param stage1_predict: прогноз первой модели для тех же строк
+    :param y_true: фактические значения для тех же строк
+    :param origins: даты начала окон
+    :param bounds: границы окон в строках X
+    """
+    from sklearn.metrics import mean_absolute_error, mean_absolute_percentage_error, r2_score
+    y_pred = stage1_predict + predict_booster(lgbm_model, X)
+    rows = []
+    for origin, (start, end) in zip(origins, bounds):
+        rows.append({'origin': origin, 'hours': end - start,
+                     'mae': mean_absolute_error(y_true[start:end], y_pred[start:end]),
+                     'mape': mean_absolute_percentage_error(y_true[start:end], y_pred[start:end]),
+                     'r2': r2_score(y_true[start:end], y_pred[start:end])})
+    return rows
+
+def make_forecast(lgbm_model, test, with_fact=False, X_test=None, num_threads=None):
+    """
+    Функция прогнозирует второй моделью ошибку первой для строк test с уже посчитанным
+    прогнозом первой модели и возвращает итоговый прогноз по часам. Вынесена на уровень
+    модуля, чтобы ее можно было запускать в отдельных процессах
+    :param test: строки датафрейма признаков после predict_first
+    :param with_fact: добавить ли в результат фактические значения
+    :param X_test: готовая матрица признаков второй модели для тех же строк, если есть
+    :param num_threads: число потоков LightGBM
+    """
+    if X_test is None:
+        X_test = get_feature_matrix(test, STAGE2_FEATURES)
+
+    with stage('predict_second') as record:
+        preds = predict_booster(lgbm_model, X_test, num_threads) 
+        record['rows'] = len(X_test)
+    #datetime strings for outputs are made from the hourly index of the selected rows only
+    preds = pd.DataFrame({'error_predicted': preds, 'datetime': test.index.strftime('%Y-%m-%d %H:%M:%S'), 'y_true': test['target'], 'stage1_predict': test['pred_stage1']}) 
+    preds['y_pred'] = preds['stage1_predict'] + preds['error_predicted']
+    
+    #submission. the fact is taken from the same slice, so no merge is needed
+    sub = pd.DataFrame({'datetime': preds['datetime'].values, 'predict': preds['y_pred'].values})
+    if with_fact:
+        sub['target'] = preds['y_true'].values
+    return sub
+
+#number of forecasts kept by a predictor for repeated requests of the same range
+RESULT_CACHE_SIZE = 64
+
 class PowerConsumptionPredictor():
-    def __init__(self, df):
-        #Get dataset
-        self.raw = df
-        #add features
-        self.df = self.preprocess(self.raw)
-        #Get predictor models
-        with open("model/model1.pkl" , 'rb') as file:  
-            self.lin_model = pickle.load(file)
-        with open("model/model2.pkl" , 'rb') as file:  
-            self.lgbm_model = pickle.load(file)
+    def __init__(self, df, lin_model=None, lgbm_model=None, num_threads=None, data_version=None,
+                 result_cache_size=RESULT_CACHE_SIZE, archive=None):
+        """
+        :param df: исходные данные в формате таблицы power_cons
+        :param lin_model: модель первого этапа, по умолчанию model1 из model/model_registry.py
+        :param lgbm_model: модель второго этапа, по умолчанию model2 оттуда же
+        :param num_threads: число потоков LightGBM на один прогноз, None - значение по умолчанию
+        :param data_version: версия данных df, входит в ключ кэша прогнозов
+        :param result_cache_size: сколько прогнозов хранить для повторных запросов, 0 - не кэшировать
+        :param archive: ForecastArchive из model/forecast_archive.py, из которого forecast_vs_fact
+        читает уже посчитанные дни
+        """
+        self.num_threads = num_threads
+        self.data_version = data_version
+        self.archive = archive
+        #forecasts by (data_version, method, start, end), least recently used first
+        self.result_cache_size = result_cache_size
+        self._results = OrderedDict()
+        self._results_lock = threading.Lock()
+        #every stage of the construction is timed, see model/instrumentation.py
+        with trace('build_predictor', rows=len(df)):
+            #add features
+            self.df = self.preprocess(df)
+            #Get predictor models. they are loaded once per process and shared by all predictors,
+            #stage 2 only when a forecast needs it
+            self.lin_model = lin_model if lin_model is not None else get_model('stage1')
+            #stage 1 is linear, so it runs as one fused kernel when the model allows it
+            self.stage1_kernel = fuse_stage1(self.lin_model)
+            self._lgbm_model = lgbm_model
+            #stage 1 output depends only on the data, not on the requested dates,
+            #so the history is scored once per data version and reused by every forecast
+            self.df = self.predict_first(self.df)
+            #stage 2 features of every row, in model order and aligned with self.df,
+            #so a forecast slices rows instead of copying columns out of the dataframe
+            with stage('feature_matrix') as record:
+                self.stage2_matrix = get_feature_matrix(self.df, STAGE2_FEATURES)
+                record['rows'] = len(self.stage2_matrix)
+
+    @property
+    def lgbm_model(self):
+        if self._lgbm_model is None:
+            self._lgbm_model = get_model('stage2')
+        return self._lgbm_model
+
+    @lgbm_model.setter
+    def lgbm_model(self, lgbm_model):
+        self._lgbm_model = lgbm_model
+        #forecasts of the previous model are no longer valid
+        self.clear_results()
     
     #Preprocessing functions
     def preprocess(self, df):
         #fix some minor missing values in weather forecasts
-        df = df.ffill()
+        with stage('ffill') as record:
+            df = df.ffill()
+            record['rows'] = len(df)
         #add features
-        df = self.add_calendar_features(df)
-        df = self.add_lags(df)
-        df = self.add_weather_and_daylight(df)
-        df = self.add_daysoff(df)
-        df = self.add_sin_cos_time(df)
-        df = self.add_school_vacations(df) 
-        #add datetime single column for outputs
-        df['timestr'] = [f'0{str(hour)}:00:00' if hour < 10 else f'{str(hour)}:00:00' for hour in df['time']]
-        df['datetime'] = df['date'].astype('str') + ' ' + df['timestr']
-        df.drop('timestr', axis=1, inplace=True)
+        for step in [self.add_calendar_features, self.add_lags, self.add_day_features,
+                     self.add_weather_and_daylight, self.add_daysoff, self.add_sin_cos_time]:
+            with stage(step.__name__) as record:
+                df = step(df)
+                record['rows'] = len(df)
+        with stage('set_schema') as record:
+            #store features with compact types
+            df = df.astype(FEATURE_SCHEMA)
+            #index rows by hour and keep them sorted, so that a date range is a contiguous slice
+            df.index = pd.DatetimeIndex(df['date'] + pd.to_timedelta(df['time'], unit='h'), name='timestamp')
+            if not df.index.is_monotonic_increasing:
+                df = df.sort_index(kind='stable')
+            record['rows'] = len(df)
         return(df)
 
     def add_calendar_features(self, df):
@@ -46,16 +228,102 @@ class PowerConsumptionPredictor():
         df['month'] = df['date'].dt.month
 
         #OHE code month
-        months = {1: 'jan', 2: 'feb', 3: 'mar', 4: 'apr', 5: 'may', 6: 'jun',
-                7: 'jul', 8: 'aug', 9: 'sep', 10: 'oct', 11: 'nov', 12: 'dec'}
-        for month in months:
-            df[months[month]] = np.where((df['month'] == month), 1, 0)
+        for month in MONTHS:
+            df[MONTHS[month]] = np.where((df['month'] == month), 1, 0)
 
         return df
 
     def add_lags(self, df):
         """
-        Функция добавляет избранные лаги для целевой переменной и температуры
+        Функция добавляет избранные лаги для целевой переменной и температуры. Непрерывный
+        почасовой ряд обрабатывается как матрица (дни x 24) в NumPy без группировок и слияний,
+        остальные случаи - через add_lags_grouped
+        """
+        if not self.is_whole_days(df):
+            return self.add_lags_grouped(df)
+
+        def shift(values, periods):
+            """
+            Сдвигает массив на periods позиций вперед, заполняя начало NaN, как Series.shift
+            """
+            shifted = np.full(len(values), np.nan)
+            if periods < len(values):
+                shifted[periods:] = values[:len(values) - periods]
+            return shifted
+
+        def daily_mean(days):
+            """
+            Возвращает среднее по каждой строке матрицы (дни x 24), пропуская NaN. Часы
+            складываются по порядку с компенсацией Кэхэна, как в groupby().mean() pandas,
+            поэтому результат совпадает побитно: попарное суммирование NumPy расходится
+            в последнем знаке, и этого хватает, чтобы пересечь порог дерева второй модели
+            """
+            total, compensation, count = np.zeros(len(days)), np.zeros(len(days)), np.zeros(len(days))
+            for hour in days.T:
+                present = ~np.isnan(hour)
+                y = hour - compensation
+                t = total + y
+                #an infinite value makes the compensation NaN, pandas resets it to 0
+                correction = np.nan_to_num(t - total - y, nan=0.0, posinf=np.inf, neginf=-np.inf)
+                total = np.where(present, t, total)
+                compensation = np.where(present, correction, compensation)
+                count += present
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return np.where(count > 0, total / count, np.nan)
+
+        def daily_stats(days):
+            """
+            Возвращает среднее, медиану, максимум и минимум по каждой строке матрицы (дни x 24),
+            пропуская NaN, как это делает groupby
+            """
+            if np.isnan(days).any():
+                return {'mean': daily_mean(days), 'median': np.nanmedian(days, axis=1),
+                        'max': np.nanmax(days, axis=1), 'min': np.nanmin(days, axis=1)}
+            return {'mean': daily_mean(days), 'median': np.median(days, axis=1),
+                    'max': days.max(axis=1), 'min': days.min(axis=1)}
+
+        values = {'target': df['target'].to_numpy(dtype='float64'), 'temp': df['temp'].to_numpy(dtype='float64')}
+        lags = {}
+
+        #add target lags
+        for i in [24, 24*2, 24*3, 24*4, 24*5, 24*6, 24*7, 25, 26, 49]:
+            lags[f'target_lag_{i}'] = shift(values['target'], i)
+
+        #add yesterdays target and temperature statistics: shift the daily rows by one
+        #and repeat each of them for the 24 hours of the next day
+        for feature in ['target', 'temp']:
+            stats = daily_stats(values[feature].reshape(-1, 24))
+            for stat in ['mean', 'median', 'max', 'min']:
+                lags[f'yesterday_{stat}_{feature}'] = np.repeat(shift(stats[stat], 1), 24)
+            lags[f'yesterday_diff_{feature}'] = lags[f'yesterday_max_{feature}'] - lags[f'yesterday_min_{feature}']
+
+        #add a temperature lag
+        for i in range(1,5):
+            lags[f'temp_lag_{i}'] = shift(values['temp'], 24*i)
+
+        #delete nans where there's no lag data (start of period)
+        lags = pd.DataFrame(lags)
+        complete = lags.notna().all(axis=1).to_numpy() & df.notna().all(axis=1).to_numpy()
+        df = pd.concat([df.reset_index(drop=True), lags], axis=1)[complete]
+
+        #drop actual temperature as it causes dataleaks
+        df = df.drop('temp', axis=1)
+
+        return df
+
+    def is_whole_days(self, df):
+        """
+        Функция проверяет, что строки образуют целые сутки по 24 часа, упорядоченные по дате
+        """
+        if len(df) == 0 or len(df) % 24 != 0:
+            return False
+        dates = df['date'].to_numpy().reshape(-1, 24)
+        return bool((dates == dates[:, :1]).all() and (dates[1:, 0] > dates[:-1, 0]).all())
+
+    def add_lags_grouped(self, df):
+        """
+        Функция добавляет избранные лаги для целевой переменной и температуры средствами pandas.
+        Используется, если ряд не состоит из целых суток по 24 часа
         """
         #add target lags
         for i in [24, 24*2, 24*3, 24*4, 24*5, 24*6, 24*7, 25, 26, 49]:
@@ -83,106 +351,82 @@ class PowerConsumptionPredictor():
 
         return df
 
+    def add_day_features(self, df):
+        """
+        Функция вычисляет признаки уровня дня (выходной, короткий день, школьные каникулы,
+        время восхода и заката) один раз для каждой даты и раздает их часам по целочисленным
+        кодам дат вместо слияния таблиц на уровне часов
+        """
+        df = df.reset_index(drop=True)
+        codes, days = pd.factorize(df['date'])
+        days = pd.DatetimeIndex(days)
+        reference = get_reference_data()
+
+        #one row per distinct date
+        daily = {'dayoff': np.where(days.isin(reference.daysoff), 1, 0),
+                 #short pre-holiday days are marked with '*' in the calendars. the models were trained
+                 #when such entries were compared as raw strings and never matched, so the flag stays 0
+                 'working_short': np.zeros(len(days), dtype='int64'),
+                 #days missing from the vacations table get NaN, as with a left merge
+                 'school_vac': reference.school_vac.reindex(days).values,
+                 'sunrise': reference.sunrise[days.month, days.day],
+                 'sunset': reference.sunset[days.month, days.day]}
+
+        #broadcast to hours
+        for feature, values in daily.items():
+            df[feature] = values[codes]
+        return df
+
     def add_weather_and_daylight(self, df):
         """
         Функция обрабатывает данные о природном освещении и погоде, создавая в итоге бинарный 
         признак, помечающий часы, когда должно быть светло, потому что солнце над горизонтом,
         но темно из-за погодных условий. Мы используем прогнозную погоду во избежание утечек
         """
-        #create columns for certain bad weather types
+        #bad weather types. cloudy is processed separately so that not to include 'малообл'
         bad_weathers = {'пасм': 'overcast', 'дожд': 'rain', 'снег': 'snow', 
                         'ливень': 'heavy_rain', 'гроз': 'thunder', 'шторм': 'storm'}
-        for weather_type in bad_weathers:
-            df[bad_weathers[weather_type]] = np.where(df['weather_pred'].str.contains(weather_type), 1, 0)
+        cloudy_bit = 1 << len(bad_weathers)
+
+        def classify_weather(weather):
+            """
+            Возвращает битовую маску плохой погоды для строки прогноза: по биту на каждый
+            тип из bad_weathers и старший бит для облачности
+            """
+            mask = 0
+            for bit, weather_type in enumerate(bad_weathers):
+                if weather_type in weather:
+                    mask |= 1 << bit
+            if ' обл' in weather or weather.startswith('обл'):
+                mask |= cloudy_bit
+            return mask
+
+        #there are only a few hundred distinct forecasts, so each of them is classified once
+        #and rows look the mask up by category code. a missing forecast (code -1, the last
+        #element) used to match every type, so it gets all bits
+        weather = df['weather_pred'].astype('category')
+        masks = np.array([classify_weather(value) for value in weather.cat.categories] + [2 * cloudy_bit - 1])
+        bad_weather = masks[weather.cat.codes.to_numpy()] != 0
+
+        #mark light hours, i.e. those between sunrise and sunset from add_day_features
+        light = df['time'].between(df['sunrise'], df['sunset']).to_numpy()
 
-        #process cloudy separately so that not to include 'малообл' 
-        df['cloudy'] = np.where((df['weather_pred'].str.contains(' обл')) |
-                                (df['weather_pred'].str.startswith('обл')), 1, 0)
-        
-        #read and preprocess our table with sunset and sunrise times for each day
-        daylight = pd.read_csv('data/light_day.csv')
-        daylight = daylight.rename(columns={'Дата': 'date', 'Восход': 'sunrise', 'Заход': 'sunset'})
-        daylight = daylight[['date', 'sunrise', 'sunset']]
-        daylight['date'] = pd.to_datetime(daylight['date']).dt.normalize()
-        daylight['day'] = daylight['date'].dt.day
-        daylight['month'] = daylight['date'].dt.month
-        daylight['sunrise'] = daylight['sunrise'].str.replace(':', '.').str.lstrip('0').astype('float')
-        daylight['sunset'] = daylight['sunset'].str.replace(':', '.').str.lstrip('0').astype('float')
-        daylight = daylight[['day', 'month', 'sunrise', 'sunset']]
-
-        #merge sunset and sunrise data to original df
-        df_with_daylight = df.merge(daylight, on=['month', 'day'], how='left')
-
-        #mark light hours, i.e. those between sunrise and sunset
-        df_with_daylight['light'] = np.where(df_with_daylight['time'].between(df_with_daylight['sunrise'], 
-                                                                        df_with_daylight['sunset']), 1, 0)
-        
         #mark hours that should be light but are dark because of bad weather conditions
-        df_with_daylight['dark_weather'] = np.where((df_with_daylight['light'] == 1) & 
-                                    (df_with_daylight[['rain', 'heavy_rain', 'thunder', 
-                                                    'storm', 'snow', 'overcast', 'cloudy']].any(axis='columns') == 1), 1, 0)
-        
+        df['dark_weather'] = np.where(light & bad_weather, 1, 0)
+
         #drop interim features that didn't prove useful
-        df_with_daylight = df_with_daylight.drop(['weather_pred', 'sunrise', 'sunset', 'cloudy', 'heavy_rain', 
-                                                'thunder', 'storm', 'overcast', 'rain', 'snow', 'light'], axis=1)
+        df = df.drop(['weather_pred', 'sunrise', 'sunset'], axis=1)
 
-        return df_with_daylight
+        return df
 
     def add_daysoff(self, df):
         """
-        Функция загружает файлы производственных календарей, обрабатывает их и проставляет 
-        метку 1 для всех выходных и праздничных дней. Эта категория шире суббот и воскресений
-        (что мы ранее извлекли из даты), т.к. включает дополнительно государственные праздники
-        и нерабочие дни, объявленные указами президента
-        Кроме того, функция создает столбец "рабочий час", отмечая единицами часы, являющиеся
-        рабочими по производственному календарю с учетом коротких дней перед праздниками
-        """
-        #read and preprocess tables with Russian production calendars
-        c19 = pd.read_csv('data/calendar2019.csv')
-        c20 = pd.read_csv('data/calendar2020.csv')
-        c21 = pd.read_csv('data/calendar2021.csv')
-        c22 = pd.read_csv('data/calendar2022.csv')
-        c23 = pd.read_csv('data/calendar2023.csv')
-
-        def get_daysoff(df, year):
-            """
-            Функция принимает датафрейм производственного календаря и возвращает список
-            всех выходных дней в соответствующем году
-            """
-            months = {'Январь': '01', 'Февраль': '02', 'Март': '03', 'Апрель': '04', 'Май': '05', 'Июнь': '06',
-            'Июль': '07', 'Август': '08', 'Сентябрь': '09', 'Октябрь': '10', 'Ноябрь': '11', 'Декабрь': '12'}
-            
-            yearly_daysoff = []
-            yearly_short = []
-            for month in months:
-                #filter out days with *. these are working short days before a holiday
-                daysoff = [day for day in df[month].item().split(',') if '*' not in day]            
-                daysoff = [day if len(day) > 1 else '0'+day for day in daysoff]
-
-                #make a separate list of short working days (prior to a holiday)
-                short_days = [day for day in df[month].item().split(',') if '*' in day]
-                short_days = [day if len(day) > 1 else '0'+day for day in short_days]
-
-                #format as proper dates
-                daysoff = [(year + '-' + months[month] + '-' + day) for day in daysoff]
-                yearly_daysoff.extend(daysoff)
-                short_days = [(year + '-' + months[month] + '-' + day) for day in short_days]
-                yearly_short.extend(short_days)
-
-            return yearly_daysoff, yearly_short
-
-        #get days off for all 5 years
-        all_daysoff = []
-        all_short = []
-        years = {'2019': c19, '2020': c20, '2021': c21, '2022': c22, '2023': c23}
-        for year in years:
-            all_daysoff.extend(get_daysoff(df=years[year], year=year)[0])
-            all_short.extend(get_daysoff(df=years[year], year=year)[1])
-
-        #add daysoff and short feature to original df
-        df['dayoff'] = np.where(df['date'].astype('str').isin(all_daysoff), 1, 0)
-        df['working_short'] = np.where(df['date'].astype('str').isin(all_short), 1, 0)
-
+        Функция создает столбец "рабочий час", отмечая единицами часы, являющиеся
+        рабочими по производственному календарю с учетом коротких дней перед праздниками.
+        Метку выходных и праздничных дней (dayoff) проставляет add_day_features. Эта категория
+        шире суббот и воскресений (что мы ранее извлекли из даты), т.к. включает дополнительно
+        государственные праздники и нерабочие дни, объявленные указами президента
+        """
         #mark working hours
         df['working_hour'] = np.where(((df['dayoff'] == 0) & (df['working_short'] == 0) & (df['time'].isin(list(range(9, 18))))) |
                                     ((df['dayoff'] == 0) & (df['working_short'] == 1) & (df['time'].isin(list(range(9, 17))))), 1, 0)
@@ -211,16 +455,6 @@ class PowerConsumptionPredictor():
         cos_sin_categorise(data=df, cos_column_name='cos_time', sin_column_name='sin_time', column_to_categorise='time')
         return df
 
-    def add_school_vacations(self, df):
-        """
-        Функция отмечает единицами дни школьных каникул и нулями - все остальные дни
-        """
-        vacs = pd.read_csv('data/holidays.csv')
-        vacs = vacs.rename(columns={'Дата': 'date', 'Каникулы': 'school_vac'})
-        vacs['date'] = pd.to_datetime(vacs['date']).dt.normalize()
-        df = df.merge(vacs, on='date', how='left')
-        return df
-    
     #count metrics
     def evaluate(self, y_true, y_pred, model_name):
         """
@@ -229,6 +463,7 @@ class PowerConsumptionPredictor():
         :param y_pred: вектор предсказаний модели
         :model_name: имя модели (для вывода)
         """
+        from sklearn.metrics import mean_absolute_error, mean_absolute_percentage_error, r2_score
         mae = mean_absolute_error(y_true, y_pred)
         mape = mean_absolute_percentage_error(y_true, y_pred)
         r2 = r2_score(y_true, y_pred)
@@ -243,36 +478,135 @@ class PowerConsumptionPredictor():
     
     #prediction functions
     def predict_first(self, df):
-        df['pred_stage1'] = self.lin_model.predict(df[['target_lag_24', 'target_lag_96', 'target_lag_120', 'target_lag_144', 'target_lag_168', 'temp_pred', 'dow', 
-                                                'day', 'week', 'jan', 'feb', 'mar', 'apr', 'may', 'jun',
-        'jul', 'aug', 'sep', 'oct', 'nov', 'dec', 'cos_time', 'working_hour', 'dark_weather', 'yesterday_diff_temp']])
-        df['stage1_error'] = df['target'] - df['pred_stage1']
-        return df
+        """
+        Функция возвращает новый датафрейм с прогнозом линейной модели и ее ошибкой.
+        Переданный датафрейм не изменяется, поэтому функцию можно вызывать из нескольких
+        потоков над общим self.df
+        """
+        with stage('predict_first') as record:
+            if self.stage1_kernel is not None:
+                pred_stage1 = self.stage1_kernel.predict(df)
+            else:
+                pred_stage1 = self.lin_model.predict(get_feature_matrix(df, STAGE1_FEATURES))
+            record['rows'] = len(df)
+            return df.assign(pred_stage1=pred_stage1, stage1_error=df['target'] - pred_stage1)
 
-    def predict_second(self, df, start_date, end_date):
-        #get test part of the df
-        test = df[(df['date'] >= start_date) & (df['date'] <= end_date)]
-        
-        X_test = test[['target_lag_24', 'target_lag_48', 'target_lag_72', 'target_lag_96', 'target_lag_120', 'target_lag_144', 'target_lag_168', 'target_lag_25',
-                'target_lag_26', 'target_lag_49', 'temp_pred', 'dow', 'day', 'month', 'time', 'yesterday_median_target', 'yesterday_mean_temp',
-                'dayoff', 'dark_weather', 'temp_lag_1', 'temp_lag_2', 'temp_lag_3', 'temp_lag_4', 'school_vac']]
+    def get_date_slice(self, df, start_date, end_date):
+        """
+        Функция возвращает срез позиций строк с start_date по end_date включительно.
+        Индекс датафрейма отсортирован по часам, поэтому границы находятся бинарным поиском
+        без построения масок по всему датафрейму
+        """
+        start = pd.Timestamp(start_date).normalize()
+        end = pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)
+        return slice(df.index.searchsorted(start, side='left'), df.index.searchsorted(end, side='left'))
 
-        preds = self.lgbm_model.predict(X_test) 
-        preds = pd.DataFrame({'error_predicted': preds, 'datetime': test['datetime'], 'y_true': test['target'], 'stage1_predict': test['pred_stage1']}) 
-        preds['y_pred'] = preds['stage1_predict'] + preds['error_predicted']
-        
-        #submission
-        sub = pd.DataFrame({'datetime': preds['datetime'], 'predict': preds['y_pred']})
-        return sub
+    def predict_second(self, df, start_date, end_date, with_fact=False):
+        #get test part of the df
+        rows = self.get_date_slice(df, start_date, end_date)
+        test = df.iloc[rows]
+        X_test = self.stage2_matrix[rows] if df is self.df else None
+        return make_forecast(self.lgbm_model, test, with_fact, X_test, self.num_threads)
     
-    #make forecast for today
+    #result cache
+    def get_cached_result(self, method, start_date, end_date, compute):
+        """
+        Функция возвращает прогноз method за период из кэша, а если его там нет - считает
+        его через compute() и сохраняет. Даты приводятся к дню, поэтому '2023-07-31' и
+        Timestamp('2023-07-31') дают один ключ. Возвращается копия, чтобы вызывающий код
+        не мог изменить сохраненный прогноз
+        """
+        key = (self.data_version, method, pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date).normalize())
+        with self._results_lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+        if result is not None:
+            COUNTERS.increment('forecast_cache_hits')
+            return result.copy()
+
+        COUNTERS.increment('forecast_cache_misses')
+        result = compute()
+        if self.result_cache_size > 0:
+            with self._results_lock:
+                self._results[key] = result
+                while len(self._results) > self.result_cache_size:
+                    self._results.popitem(last=False)
+        return result.copy()
+
+    def clear_results(self):
+        with self._results_lock:
+            self._results.clear()
+
+    #make forecast for today. forecast functions never modify self.df, so a single
+    #predictor can serve concurrent sessions
     def forecast_today(self, start_date, end_date):
-        self.df = self.predict_first(self.df)
-        return self.predict_second(self.df, start_date, end_date)
+        with trace('forecast_today', start_date=str(start_date), end_date=str(end_date)):
+            return self.get_cached_result('forecast_today', start_date, end_date,
+                                          lambda: self.predict_second(self.df, start_date, end_date))
     
-    #compare historic forecast to fact
+    #compare historic forecast to fact. past days are read from the archive when it has them
     def forecast_vs_fact(self, start_date, end_date):
-        self.df = self.predict_first(self.df)
-        pred = self.predict_second(self.df, start_date, end_date)
-        return pred.merge(self.df, how='left', on='datetime')[['datetime', 'predict', 'target']]
-        
+        def compute():
+            if self.archive is not None and self.archive.covers(start_date, end_date):
+                return self.archive.read(start_date, end_date)
+            return self.predict_second(self.df, start_date, end_date, with_fact=True)
+
+        with trace('forecast_vs_fact', start_date=str(start_date), end_date=str(end_date)):
+            return self.get_cached_result('forecast_vs_fact', start_date, end_date, compute)
+
+    def get_today(self):
+        """
+        Функция возвращает "сегодня" данных - последний день истории в виде строки
+        'YYYY-MM-DD'. Его прогнозируют главная страница, страница прогноза и сервис
+        """
+        return self.df.index[-1].strftime('%Y-%m-%d') if len(self.df) else None
+
+    def get_history_bounds(self):
+        """
+        Функция возвращает первый и последний день, для которых есть прогноз и факт:
+        границы архива, а без него - дни данных без последнего, еще не закрытого
+        """
+        if self.archive is not None and self.archive.bounds is not None:
+            return self.archive.bounds
+        index = self.df.index
+        return index[0].normalize(), index[-1].normalize() - pd.Timedelta(days=1)
+
+    #rolling-origin backtest
+    def backtest(self, origins, horizon=1, n_jobs=1):
+        """
+        Функция проверяет качество прогноза по скользящему началу: для каждой даты из origins
+        строится прогноз на horizon дней вперед и сравнивается с фактом. Все окна берутся из
+        одного датафрейма признаков, а вторая модель вызывается по разу на группу окон
+        :param origins: даты начала прогноза, например каждый день года
+        :param horizon: длина окна прогноза в днях
+        :param n_jobs: число процессов, по которым распределяются окна
+        Возвращает датафрейм с колонками origin, hours, mae, mape, r2 - по строке на окно
+        """
+        #positions of the rows of every window, windows without data are skipped
+        windows = []
+        for origin in pd.to_datetime(pd.Index(origins)).normalize():
+            rows = self.get_date_slice(self.df, origin, origin + pd.Timedelta(days=horizon - 1))
+            if rows.stop > rows.start:
+                windows.append((origin, rows))
+        if not windows:
+            return pd.DataFrame(columns=['origin', 'hours', 'mae', 'mape', 'r2'])
+
+        #split the windows into a group per process
+        n_jobs = max(1, min(n_jobs, len(windows)))
+        tasks = []
+        for group in np.array_split(np.arange(len(windows)), n_jobs):
+            positions = np.concatenate([np.arange(windows[i][1].start, windows[i][1].stop) for i in group])
+            sizes = np.array([windows[i][1].stop - windows[i][1].start for i in group])
+            bounds = list(zip(np.cumsum(sizes) - sizes, np.cumsum(sizes)))
+            test = self.df.iloc[positions]
+            tasks.append((self.lgbm_model, self.stage2_matrix[positions], test['pred_stage1'].to_numpy(),
+                          test['target'].to_numpy(), [windows[i][0] for i in group], bounds))
+
+        if n_jobs == 1:
+            results = [score_windows(*tasks[0])]
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                results = list(executor.map(score_windows, *zip(*tasks)))
+
+        return pd.DataFrame([row for rows in results for row in rows])
@@ -0,0 +1,84 @@
+import glob
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+CALENDAR_MONTHS = {'Январь': 1, 'Февраль': 2, 'Март': 3, 'Апрель': 4, 'Май': 5, 'Июнь': 6,
+                   'Июль': 7, 'Август': 8, 'Сентябрь': 9, 'Октябрь': 10, 'Ноябрь': 11, 'Декабрь': 12}
+
+class ReferenceData():
+    """
+    Справочные данные, разобранные один раз и сжатые в массивы, индексированные датой:
+    :attr years: годы, для которых найдены производственные календари
+    :attr daysoff: DatetimeIndex выходных и праздничных дней по производственным календарям
+    :attr school_vac: Series с меткой школьных каникул, индексированная датой
+    :attr sunrise: массив 13x32 с временем восхода по (месяц, день), NaN для отсутствующих дней
+    :attr sunset: массив 13x32 с временем заката по (месяц, день)
+    """
+    def __init__(self, data_dir):
+        self.years, self.daysoff = self.read_calendars(data_dir)
+        self.school_vac = self.read_school_vacations(data_dir)
+        self.sunrise, self.sunset = self.read_daylight(data_dir)
+
+    def read_calendars(self, data_dir):
+        """
+        Функция читает все найденные файлы производственных календарей calendarYYYY.csv
+        и возвращает список годов и отсортированный индекс выходных дней
+        """
+        years = []
+        daysoff = []
+        for path in list_calendar_files(data_dir):
+            calendar = pd.read_csv(path)
+            year = int(calendar.iloc[0, 0])
+            years.append(year)
+            for month_name, month in CALENDAR_MONTHS.items():
+                for day in str(calendar[month_name].item()).split(','):
+                    #entries marked with '*' (short day) or '+' (moved day off) never matched
+                    #the string comparison the models were trained with, so they are skipped
+                    if day.strip().isdigit():
+                        daysoff.append(f'{year}-{month:02d}-{int(day):02d}')
+        return sorted(years), pd.DatetimeIndex(sorted(set(daysoff)))
+
+    def read_school_vacations(self, data_dir):
+        vacs = pd.read_csv(os.path.join(data_dir, 'holidays.csv'))
+        return pd.Series(vacs['Каникулы'].values, index=pd.to_datetime(vacs['Дата']).dt.normalize().values, name='school_vac')
+
+    def read_daylight(self, data_dir):
+        daylight = pd.read_csv(os.path.join(data_dir, 'light_day.csv'))
+        dates = pd.to_datetime(daylight['Дата'])
+        sunrise = np.full((13, 32), np.nan)
+        sunset = np.full((13, 32), np.nan)
+        #times like 09:01 are stored as hours with minutes after the point, i.e. 9.01
+        sunrise[dates.dt.month, dates.dt.day] = daylight['Восход'].str.replace(':', '.').str.lstrip('0').astype('float')
+        sunset[dates.dt.month, dates.dt.day] = daylight['Заход'].str.replace(':', '.').str.lstrip('0').astype('float')
+        return sunrise, sunset
+
+def list_calendar_files(data_dir):
+    return sorted(glob.glob(os.path.join(data_dir, 'calendar[0-9][0-9][0-9][0-9].csv')))
+
+def get_signature(data_dir):
+    """
+    Функция возвращает пути и время изменения справочных файлов. Новый календарь или
+    изменение любого файла меняют подпись и приводят к повторному чтению
+    """
+    paths = list_calendar_files(data_dir) + [os.path.join(data_dir, 'holidays.csv'), os.path.join(data_dir, 'light_day.csv')]
+    return tuple((path, os.stat(path).st_mtime_ns) for path in paths)
+
+_cache = {}
+_lock = threading.Lock()
+
+def get_reference_data(data_dir=DATA_DIR):
+    """
+    Функция возвращает справочные данные, общие для всего процесса. Файлы читаются
+    заново только если изменился их набор или время изменения
+    """
+    signature = get_signature(data_dir)
+    with _lock:
+        cached = _cache.get(data_dir)
+        if cached is None or cached[0] != signature:
+            cached = (signature, ReferenceData(data_dir))
+            _cache[data_dir] = cached
+        return cached[1]
@@ -1,17 +1,19 @@
 #Load libraries needed
 import streamlit as st
-import plotly.express as px
-import base64
 from st_pages import Page, show_pages, add_page_title, show_pages_from_config, hide_pages
 from st_clickable_images import clickable_images
-from model.power_comsumption_predictor import PowerConsumptionPredictor
-from utils.excel_saver import to_excel
-from utils.df_getter import get_df
+from utils.images import get_flag_images
+from utils.excel_saver import export, FORMATS
+from utils.predictor_getter import get_predictor
+from utils.debug_panel import is_debug, show_debug_panel
+from model.instrumentation import trace
 
 if 'language' not in st.session_state:
     st.session_state['language'] = 'ru'
-if 'pcp' not in st.session_state:
-    st.session_state['pcp'] = PowerConsumptionPredictor(get_df())
+#all sessions share one predictor per data version
+with trace('get_predictor') as predictor_trace:
+    st.session_state['pcp'] = get_predictor()
+page_traces = [predictor_trace]
 
 #Set content dictionary
 text = {'menu_home': {'en': 'Home', 'ru': 'Главная'},
@@ -24,25 +26,23 @@ text = {'menu_home': {'en': 'Home', 'ru': 'Главная'},
         'datetime': {'en': 'Date and Hour', 'ru': 'Дата и Час'},
         'pred': {'en': 'Predicted Value', 'ru': 'Прогнозное значение'},
         'down_button': {'en': '📥 Download Forecast', 'ru': '📥 Скачать прогноз'},
-        'down_help': {'en': 'Download this table as .xlsx file', 'ru': 'Скачать эту таблицу в формате .xlsx'},
+        'down_help': {'en': 'Download this table as .xlsx, .csv or .parquet file', 'ru': 'Скачать эту таблицу в формате .xlsx, .csv или .parquet'},
+        'down_format': {'en': 'File format', 'ru': 'Формат файла'},
         'chart_title': {'en': "Model's Forecast", 'ru': 'Прогноз модели'},
         'caption': {'en': 'You could have noticed that "today" is always July 31, 2023 and the data in the table above seems pre-designed. That is due to the fact that July 31, 2023 is the last day in the data available. Though the forecast is being counted right now, when you load the page. With "true today" data provided forecast for it could easily be obtained as well',
                     'ru': 'Вы могли заметить, что "сегодня" это всегда 31 июля 2023, а значения в таблице кажутся подготовленными заранее. Дело в том, что 31 июля - это последний день, для которого у нас имеются данные. При этом прогноз по ним считается прямо сейчас, когда вы загружаете страницу. Если предоставить модели данные по "настоящему сегодняшнему дню", можно так же легко получить прогноз и по ним'}}
 
-#Define forecast dates
-START_TEST = '2023-07-31'
-END_TEST = '2023-07-31'
+#Define forecast dates: "today" is the last day of the data, the same day as on the Home page
+START_TEST = st.session_state['pcp'].get_today()
+END_TEST = START_TEST
 
-forecast = st.session_state['pcp'].forecast_today(START_TEST, END_TEST)
+with trace('forecast_page') as forecast_trace:
+    forecast = st.session_state['pcp'].forecast_today(START_TEST, END_TEST)
+page_traces.append(forecast_trace)
 
 with st.sidebar:
-    images = []
-    for file in ["images/russia.png", "images/united-kingdom.png"]:
-        with open(file, "rb") as image:
-            encoded = base64.b64encode(image.read()).decode()
-            images.append(f"data:image/jpeg;base64,{encoded}")
-
-    clicked = clickable_images(images,
+    #the flags are encoded once per process
+    clicked = clickable_images(list(get_flag_images()),
                                titles=['RU', 'EN'],
                                div_style={"display": "flex", "justify-content": "center", "flex-wrap": "wrap"},
                                img_style={"margin": "5px", "height": "25px"})
@@ -83,15 +83,19 @@ with prediction:
         st.dataframe(forecast, hide_index=True, column_config={'datetime': st.column_config.DatetimeColumn(label=text['datetime'][st.session_state['language']], format='DD.MM.YYYY, HH'),
                                                             'predict': st.column_config.NumberColumn(label=text['pred'][st.session_state['language']], format='%.2f')}, width=280)
     with col2:
-        df_xlsx = to_excel(forecast)
+        #exports are cached by content, so reruns with the same forecast reuse the file
+        file_format = st.selectbox(text['down_format'][st.session_state['language']], list(FORMATS), label_visibility='collapsed')
         st.download_button(label=text['down_button'][st.session_state['language']],
-                                    data=df_xlsx ,
-                                    file_name=f'{START_TEST}_power_consumption_forecast.xlsx',
+                                    data=export(forecast, file_format),
+                                    file_name=f'{START_TEST}_power_consumption_forecast.{FORMATS[file_format][1]}',
+                                    mime=FORMATS[file_format][0],
                                     help=text['down_help'][st.session_state['language']])
         
     st.caption(text['caption'][st.session_state['language']])
 
-    # Create a Plotly line chart for the model's predictions
+    # Create a Plotly line chart for the model's predictions. plotly is imported here,
+    # after the table is on screen
+    import plotly.express as px
     fig = px.line(forecast, x='datetime', y='predict', title=text['chart_title'][st.session_state['language']], labels={'datetime': text['datetime'][st.session_state['language']],
                                                                                                                         'predict': text['pred'][st.session_state['language']]})
     # Display the chart using st.plotly_chart()
@@ -106,4 +110,8 @@ st.markdown(
         } 
     </style>
     """, unsafe_allow_html=True
-)
\ No newline at end of file
+)
+
+#optional debug panel with stage timings, open the page with ?debug=1
+if is_debug():
+    show_debug_panel(*page_traces)
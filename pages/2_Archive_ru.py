@@ -1,18 +1,21 @@
 ##Load libraries
 import streamlit as st
-import plotly.express as px
 import datetime
-import base64
 from st_pages import Page, show_pages, add_page_title, show_pages_from_config, hide_pages
 from st_clickable_images import clickable_images
-from model.power_comsumption_predictor import PowerConsumptionPredictor
-from utils.excel_saver import to_excel
-from utils.df_getter import get_df
+from utils.images import get_flag_images
+from utils.excel_saver import export, FORMATS
+from utils.chart_downsampler import downsample, get_render_mode, MAX_POINTS
+from utils.predictor_getter import get_predictor
+from utils.debug_panel import is_debug, show_debug_panel
+from model.instrumentation import trace
 
 if 'language' not in st.session_state:
     st.session_state['language'] = 'ru'
-if 'pcp' not in st.session_state:
-    st.session_state['pcp'] = PowerConsumptionPredictor(get_df())
+#all sessions share one predictor per data version
+with trace('get_predictor') as predictor_trace:
+    st.session_state['pcp'] = get_predictor()
+page_traces = [predictor_trace]
 if 'show_prediction_message' not in st.session_state:
     st.session_state['show_prediction_message'] = False
 
@@ -30,12 +33,14 @@ text = {'menu_home': {'en': 'Home', 'ru': 'Главная'},
         'pred': {'en': 'Predicted Value', 'ru': 'Прогнозное значение'},
         'fact': {'en': 'Actual Value', 'ru': 'Фактическое значение'},
         'down_button': {'en': '📥 Download Forecast', 'ru': '📥 Скачать прогноз'},
-        'down_help': {'en': 'Download this table as .xlsx file', 'ru': 'Скачать эту таблицу в формате .xlsx'},
+        'down_help': {'en': 'Download this table as .xlsx, .csv or .parquet file', 'ru': 'Скачать эту таблицу в формате .xlsx, .csv или .parquet'},
+        'down_format': {'en': 'File format', 'ru': 'Формат файла'},
         'chart_title': {'en': "Model's Forecast VS Actual Value", 'ru': 'Прогноз модели / Фактическое значение'},
         'value': {'en': 'Value', 'ru': 'Значение'},
         'chart_var': {'en': 'Power Consumption, MWh', 'ru': 'Энергопотребление, МВт*ч'},
         'chart_pred': {'en': 'Forecast', 'ru': 'Прогноз'},
         'chart_fact': {'en': 'Fact', 'ru': 'Факт'},
+        'zoom': {'en': 'Zoom to dates', 'ru': 'Приблизить период'},
         'metrics': {'en': "Prediction quality metrics", 'ru': 'Метрики качества предсказания'},
         'metrics_comment': {'en': """
 MAE is Mean Absolute Error, average absolute value of the difference between the predicted target and the true one \n
@@ -49,13 +54,8 @@ r2 - коэффициент детерминации. Показывает до
                             """}}
 
 with st.sidebar:
-    images = []
-    for file in ["images/russia.png", "images/united-kingdom.png"]:
-        with open(file, "rb") as image:
-            encoded = base64.b64encode(image.read()).decode()
-            images.append(f"data:image/jpeg;base64,{encoded}")
-
-    clicked = clickable_images(images,
+    #the flags are encoded once per process
+    clicked = clickable_images(list(get_flag_images()),
                                titles=['RU', 'EN'],
                                div_style={"display": "flex", "justify-content": "center", "flex-wrap": "wrap"},
                                img_style={"margin": "5px", "height": "25px"})
@@ -92,14 +92,16 @@ with header:
 
 # Set up the data section that users will interact with
 with prediction:
+    # Any closed day of the history can be selected, its forecast is read from the archive
+    first_day, last_day = (day.date() for day in st.session_state['pcp'].get_history_bounds())
     with st.form('date_select'):
         col1, col2 = st.columns([0.72, 0.28])
         with col1:
             # Define Streamlit inputs
             dates = st.date_input(label=text['calendar_label'][st.session_state['language']], 
-                            value=(datetime.date(2023, 7, 24), datetime.date(2023, 7, 30)), 
-                            min_value=datetime.date(2023, 4, 1), 
-                            max_value=datetime.date(2023, 7, 30))
+                            value=(max(first_day, last_day - datetime.timedelta(days=6)), last_day), 
+                            min_value=first_day, 
+                            max_value=last_day)
         with col2:
             # Create a button
             predicted = st.form_submit_button(text['pred_button'][st.session_state['language']])
@@ -108,7 +110,9 @@ with prediction:
     if predicted or st.session_state['show_prediction_message']:
         st.session_state['show_prediction_message'] = True  # Set the flag to True when the "Predict" button is pressed
         start_date, end_date = (x.strftime('%Y-%m-%d') for x in dates)
-        forecast_fact = st.session_state['pcp'].forecast_vs_fact(start_date, end_date)
+        with trace('archive_page') as forecast_trace:
+            forecast_fact = st.session_state['pcp'].forecast_vs_fact(start_date, end_date)
+        page_traces.append(forecast_trace)
 
         col1, col2 = st.columns([0.72, 0.28])
         with col1: 
@@ -117,15 +121,26 @@ with prediction:
                                                                         'predict': st.column_config.NumberColumn(label=text['pred'][st.session_state['language']], format='%.2f'),
                                                                         'target': st.column_config.NumberColumn(label=text['fact'][st.session_state['language']], format='%.2f')}, width=460)
         with col2:
-            df_xlsx = to_excel(forecast_fact)
+            #exports are cached by content, so reruns with the same forecast reuse the file
+            file_format = st.selectbox(text['down_format'][st.session_state['language']], list(FORMATS), label_visibility='collapsed')
             st.download_button(label=text['down_button'][st.session_state['language']],
-                                    data=df_xlsx ,
-                                    file_name=f'{start_date}_to_{end_date}_forecast_vs_fact.xlsx',
+                                    data=export(forecast_fact, file_format),
+                                    file_name=f'{start_date}_to_{end_date}_forecast_vs_fact.{FORMATS[file_format][1]}',
+                                    mime=FORMATS[file_format][0],
                                     help=text['down_help'][st.session_state['language']])
 
-        # Create a Plotly line chart for the model's predictions
+        # Create a Plotly line chart for the model's predictions. Long periods are drawn
+        # from LTTB-downsampled points, the zoom control redraws a part of the period
+        # from the full-resolution forecast
+        import plotly.express as px
         to_plot = ['predict', 'target']
-        fig = px.line(forecast_fact, x='datetime', y=to_plot, title=text['chart_title'][st.session_state['language']], labels={'datetime': text['datetime'][st.session_state['language']],
+        chart_data = forecast_fact
+        if len(forecast_fact) > MAX_POINTS:
+            days = forecast_fact['datetime'].str[:10].unique()
+            zoom = st.select_slider(text['zoom'][st.session_state['language']], options=days, value=(days[0], days[-1]))
+            chart_data = forecast_fact[forecast_fact['datetime'].str[:10].between(*zoom)]
+        chart_data = downsample(chart_data, to_plot)
+        fig = px.line(chart_data, x='datetime', y=to_plot, render_mode=get_render_mode(len(chart_data)), title=text['chart_title'][st.session_state['language']], labels={'datetime': text['datetime'][st.session_state['language']],
                                                                                                                         'value': text['value'][st.session_state['language']],
                                                                                                                         'variable': text['chart_var'][st.session_state['language']]})
         newnames = {'predict':text['chart_pred'][st.session_state['language']], 'target': text['chart_fact'][st.session_state['language']]}
@@ -156,4 +171,8 @@ st.markdown(
         } 
     </style>
     """, unsafe_allow_html=True
-)
\ No newline at end of file
+)
+
+#optional debug panel with stage timings, open the page with ?debug=1
+if is_debug():
+    show_debug_panel(*page_traces)
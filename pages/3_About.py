@@ -1,16 +1,17 @@
 import streamlit as st
 import pandas as pd
 from st_pages import Page, show_pages, show_pages_from_config, hide_pages
-import base64
-import plotly.express as px
 from st_clickable_images import clickable_images
-from model.power_comsumption_predictor import PowerConsumptionPredictor
+from utils.images import get_flag_images
 from utils.df_getter import get_df
+from utils.chart_downsampler import downsample, get_render_mode, MAX_POINTS
 
 if 'language' not in st.session_state:
     st.session_state['language'] = 'ru'
-if 'pcp' not in st.session_state:
-    st.session_state['pcp'] = PowerConsumptionPredictor(get_df())
+#the page shows the raw data only, so it needs no predictor and no models.
+#it fetches a sample of the table and the consumption history
+sample = get_df(limit=10)
+history = get_df(columns=['date', 'time', 'target'])
 
 #Set content dictionary
 text = {'menu_home': {'en': 'Home', 'ru': 'Главная'},
@@ -48,6 +49,7 @@ text = {'menu_home': {'en': 'Home', 'ru': 'Главная'},
          'subheader_plot': {'en': 'Target plot', 'ru': 'График целевой переменной'},
          'datetime': {'en': 'Time', 'ru': 'Время'},
          'target': {'en': 'Actual power consumption, MWh', 'ru': 'Фактическое потребление электроэнергии, МВт*ч'},
+         'zoom': {'en': 'Zoom to dates', 'ru': 'Приблизить период'},
          'subheader_model': {'en': 'About the model', 'ru': 'О модели'},
          'model_desc': {'en': 'In this competition we were to solve a regression task on tabular data. Expectedly top rating positions were taken by various realizations of gradient boosting. However throughout our experiments it occured that a two models ensemble performed better than just a boosting. So first we fitted an l1-regulirized linear regression for its nulifying weights of insignificant features as well as linear models capacity to extrapolate. Then to achieve better quality of prediction we counted the models error and fitted gradient boosting on it. You can read about fitting and testing processes in more detail [here](%s)',
                       'ru': 'В этом соревновании мы работали над задачей регрессии на табличных данных. Ожидаемо все лучшие позиции в рейтинге заняли различные реализации градиентного бустинга. Однако в ходе наших экспериментов лучше, чем просто бустинг показал себя ансамбль из двух моделей. Первым этапом мы обучили линейную регрессию с регуляризацией l1, ради зануления весов незначимых признаков, а также способности линейных моделей к экстраполяции. Затем для повышения точности рассчитали ошибку этой модели и на ней обучили градиентный бустинг. Подробнее об обучении и тестировании вы можете почитать [здесь](%s)'},
@@ -85,13 +87,8 @@ text = {'menu_home': {'en': 'Home', 'ru': 'Главная'},
 
 #add a sidebar to select pages
 with st.sidebar:
-    images = []
-    for file in ["images/russia.png", "images/united-kingdom.png"]:
-        with open(file, "rb") as image:
-            encoded = base64.b64encode(image.read()).decode()
-            images.append(f"data:image/jpeg;base64,{encoded}")
-
-    clicked = clickable_images(images,
+    #the flags are encoded once per process
+    clicked = clickable_images(list(get_flag_images()),
                                titles=['RU', 'EN'],
                                div_style={"display": "flex", "justify-content": "center", "flex-wrap": "wrap"},
                                img_style={"margin": "5px", "height": "25px"})
@@ -131,11 +128,20 @@ with body:
     st.subheader(text['subheader_data'][st.session_state['language']])
     st.image('images/kaliningrad.jpg')
     st.write(text['data_desc'][st.session_state['language']])
-    st.dataframe(st.session_state['pcp'].raw.head(10))
+    st.dataframe(sample)
     st.markdown(text['data_columns'][st.session_state['language']])
 
-    # Create a Plotly line chart for the model's predictions
-    fig = px.line(st.session_state['pcp'].df, x='datetime', y='target', title=text['subheader_plot'][st.session_state['language']], labels={'datetime': text['datetime'][st.session_state['language']],
+    # Create a Plotly line chart for the model's predictions. The whole history is drawn
+    # from LTTB-downsampled points, the zoom control redraws a part of it in full detail
+    import plotly.express as px
+    chart_data = pd.DataFrame({'target': history['target'].to_numpy()},
+                              index=pd.DatetimeIndex(pd.to_datetime(history['date']) + pd.to_timedelta(history['time'], unit='h'), name='timestamp')).sort_index()
+    if len(chart_data) > MAX_POINTS:
+        days = chart_data.index.normalize().unique().strftime('%Y-%m-%d')
+        zoom = st.select_slider(text['zoom'][st.session_state['language']], options=days, value=(days[0], days[-1]))
+        chart_data = chart_data.loc[zoom[0]:zoom[1]]
+    chart_data = downsample(chart_data, ['target'])
+    fig = px.line(chart_data, x=chart_data.index, y='target', render_mode=get_render_mode(len(chart_data)), title=text['subheader_plot'][st.session_state['language']], labels={'timestamp': text['datetime'][st.session_state['language']],
                                                                                                                         'target': text['target'][st.session_state['language']]})
     # Display the chart using st.plotly_chart()
     st.plotly_chart(fig)
@@ -0,0 +1,144 @@
+"""
+Batch forecaster: reads power_cons history from a CSV or Parquet file, runs the
+two-stage model over a date range and writes the hourly forecasts chunk by
+chunk, so neither Streamlit nor the whole result in memory is needed. Run from
+the repository root:
+
+    python -m service.batch_forecast power_cons.parquet forecasts.csv
+    python -m service.batch_forecast power_cons.csv forecasts.parquet --start 2023-01-01 --end 2023-06-30 --with-fact --jobs 4
+
+The features are built once for the whole history, as the lags need it. Then
+every chunk of --chunk-days days is passed through the stage 2 model, in
+--jobs worker processes if requested, and appended to the output in date order
+"""
+import argparse
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from model.power_comsumption_predictor import PowerConsumptionPredictor, make_forecast
+from utils.power_cons_db import POWER_CONS_COLUMNS
+
+#columns of the power_cons table used by the predictor
+RAW_COLUMNS = POWER_CONS_COLUMNS
+
+def read_history(path):
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path, columns=RAW_COLUMNS)
+    return pd.read_csv(path, usecols=RAW_COLUMNS)
+
+class ChunkWriter():
+    """
+    Appends forecast chunks to a CSV file or to row groups of a Parquet file
+    """
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith('.parquet')
+        self.writer = None
+
+    def write(self, chunk):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.path, table.schema)
+            self.writer.write_table(table)
+        else:
+            chunk.to_csv(self.path, mode='a' if self.writer else 'w', header=self.writer is None, index=False)
+            self.writer = True
+
+    def close(self):
+        if self.parquet and self.writer is not None:
+            self.writer.close()
+
+def make_chunks(predictor, start_date, end_date, chunk_days):
+    """
+    Returns the feature rows and stage 2 matrix rows of consecutive chunk_days-day
+    ranges between the dates
+    """
+    chunks = []
+    for chunk_start in pd.date_range(start_date, end_date, freq=f'{chunk_days}D'):
+        chunk_end = min(chunk_start + pd.Timedelta(days=chunk_days - 1), end_date)
+        rows = predictor.get_date_slice(predictor.df, chunk_start, chunk_end)
+        if rows.stop > rows.start:
+            chunks.append((predictor.df.iloc[rows], predictor.stage2_matrix[rows]))
+    return chunks
+
+#worker processes receive the stage 2 model once, at start
+_worker_model = None
+
+def set_worker_model(lgbm_model):
+    global _worker_model
+    _worker_model = lgbm_model
+
+def forecast_chunk(test, X_test, with_fact):
+    return make_forecast(_worker_model, test, with_fact, X_test)
+
+def run(predictor, writer, start_date, end_date, chunk_days=31, with_fact=False, jobs=1):
+    """
+    Writes the forecasts of all chunks in date order and returns the number of rows.
+    With several jobs at most two chunks per worker are in flight, so the results
+    never pile up in memory
+    """
+    chunks = make_chunks(predictor, start_date, end_date, chunk_days)
+    rows = 0
+    if jobs == 1:
+        for test, X_test in chunks:
+            forecast = make_forecast(predictor.lgbm_model, test, with_fact, X_test, predictor.num_threads)
+            writer.write(forecast)
+            rows += len(forecast)
+        return rows
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=set_worker_model, initargs=(predictor.lgbm_model,)) as executor:
+        pending = deque()
+        for test, X_test in chunks:
+            pending.append(executor.submit(forecast_chunk, test, X_test, with_fact))
+            if len(pending) >= 2 * jobs:
+                forecast = pending.popleft().result()
+                writer.write(forecast)
+                rows += len(forecast)
+        while pending:
+            forecast = pending.popleft().result()
+            writer.write(forecast)
+            rows += len(forecast)
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Write hourly power consumption forecasts for a date range')
+    parser.add_argument('input', help='CSV or Parquet file with the power_cons columns')
+    parser.add_argument('output', help='CSV or Parquet file to write, by extension')
+    parser.add_argument('--start', help='first forecast date, defaults to the first date with features')
+    parser.add_argument('--end', help='last forecast date, defaults to the last date of the input')
+    parser.add_argument('--chunk-days', type=int, default=31)
+    parser.add_argument('--with-fact', action='store_true', help='add the actual consumption as a target column')
+    parser.add_argument('--jobs', type=int, default=1, help='worker processes for the stage 2 model')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    df = read_history(args.input)
+    loaded = time.perf_counter()
+    predictor = PowerConsumptionPredictor(df)
+    built = time.perf_counter()
+    del df
+
+    index = predictor.df.index
+    if len(index) == 0:
+        sys.exit('not enough history to build features')
+    start_date = pd.Timestamp(args.start or index[0]).normalize()
+    end_date = pd.Timestamp(args.end or index[-1]).normalize()
+
+    writer = ChunkWriter(args.output)
+    try:
+        rows = run(predictor, writer, start_date, end_date, args.chunk_days, args.with_fact, max(1, args.jobs))
+    finally:
+        writer.close()
+    finished = time.perf_counter()
+
+    print(f'read the input in {loaded - started:.2f} s, built {len(index)} rows of features in {built - loaded:.2f} s', file=sys.stderr)
+    print(f'wrote {rows} forecast rows from {start_date:%Y-%m-%d} to {end_date:%Y-%m-%d} in {finished - built:.2f} s, '
+          f'{rows / max(finished - built, 1e-9):.0f} rows/s ({rows / (finished - started):.0f} rows/s end to end)', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import numpy as np
+
+# Points per series sent to the browser. Longer series are downsampled with LTTB
+MAX_POINTS = 2000
+# Above this many points per series the charts use WebGL traces instead of SVG
+WEBGL_POINTS = 1000
+
+def lttb_indices(y, threshold):
+    """
+    Largest-Triangle-Three-Buckets: returns the positions of threshold points of y
+    that keep the visual shape of the line (peaks and troughs), always including
+    the first and the last point. Points are assumed to be evenly spaced
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    y = np.asarray(y, dtype='float64')
+
+    # threshold - 2 buckets between the first and the last point
+    edges = np.linspace(1, n - 1, threshold - 1).astype('int64')
+    # the average point of the next bucket is the third corner of the triangle. it does not
+    # depend on the points picked so far, so all of them are computed at once
+    starts, ends = edges[1:], np.append(edges[2:], n)
+    next_x = (starts + ends - 1) / 2
+    next_y = np.add.reduceat(y, starts) / (ends - starts)
+
+    selected = np.empty(threshold, dtype='int64')
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # twice the triangle area, the constant factor does not change the argmax
+        area = np.abs((previous - next_x[bucket]) * (y[start:end] - y[previous])
+                      - (previous - np.arange(start, end)) * (next_y[bucket] - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+def downsample(df, columns, max_points=MAX_POINTS):
+    """
+    Returns the rows of df needed to draw every column of columns with at most
+    max_points points each: the union of the LTTB points of all the columns
+    """
+    if len(df) <= max_points:
+        return df
+    positions = np.unique(np.concatenate([lttb_indices(df[column].to_numpy(), max_points) for column in columns]))
+    return df.iloc[positions]
+
+def get_render_mode(rows):
+    # plotly express render_mode for a chart of this many points per series
+    return 'webgl' if rows > WEBGL_POINTS else 'svg'
@@ -0,0 +1,27 @@
+import streamlit as st
+import pandas as pd
+from model.instrumentation import COUNTERS
+
+def is_debug():
+    # The panel is only shown when the page is opened with ?debug=1
+    return st.experimental_get_query_params().get('debug', [''])[0] == '1'
+
+def show_debug_panel(*traces):
+    """
+    Shows the stages of the given traces of this page run and the
+    process-wide counters, see model/instrumentation.py
+    """
+    with st.expander('Debug: stage timings', expanded=True):
+        for trace in traces:
+            st.caption(f'{trace.name}: {trace.seconds * 1000:.1f} ms')
+            stages = pd.DataFrame(trace.stages, columns=['stage', 'rows', 'seconds', 'peak_bytes'])
+            stages['ms'] = stages['seconds'] * 1000
+            st.dataframe(stages[['stage', 'rows', 'ms', 'peak_bytes']], hide_index=True)
+
+        st.caption('Process counters')
+        snapshot = COUNTERS.snapshot()
+        counters = pd.DataFrame.from_dict(snapshot['stage'], orient='index')
+        st.dataframe(counters)
+        # Event counters, e.g. forecast cache hits and misses
+        if snapshot['events']:
+            st.dataframe(pd.Series(snapshot['events'], name='count'))
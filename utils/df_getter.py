@@ -1,10 +1,36 @@
 import streamlit as st
 import pandas as pd
+from model.instrumentation import stage
+from utils.history_cache import HistoryCache
+from utils.power_cons_db import POWER_CONS_COLUMNS
 
-def get_df():
-    # Initialize connection.
-    conn = st.connection("postgresql", type="sql")
+# New rows are queried at most this often, as the previous ten minute TTL did
+REFRESH_SECONDS = 600
 
-    # Perform query.
-    df = pd.DataFrame(conn.query("SELECT * FROM power_cons ;", ttl="10m"))
-    return df
\ No newline at end of file
+# Local copy of power_cons shared by all sessions, refreshed incrementally
+_history = HistoryCache()
+
+def get_df(columns=POWER_CONS_COLUMNS, start_date=None, end_date=None, limit=None):
+    """
+    Returns the power_cons rows between start_date and end_date (inclusive,
+    None for no bound) with only the given columns. The rows come from the
+    local history cache, which queries the database only for the rows after
+    the last hour it has. With a limit only the first rows by date and hour
+    are returned, e.g. for a sample. The data version of the cache is in
+    df.attrs['data_version']
+    """
+    with stage('get_df') as record:
+        # Initialize connection. Its SQLAlchemy engine keeps a pool of connections
+        conn = st.connection("postgresql", type="sql")
+        history, version = _history.get(conn.engine, REFRESH_SECONDS)
+        # The cache is sorted by hour, so the date bounds and the limit are a
+        # slice found by binary search instead of a mask over the whole history
+        start = 0 if start_date is None else history.index.searchsorted(pd.Timestamp(start_date).normalize())
+        end = len(history) if end_date is None else \
+            history.index.searchsorted(pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1))
+        if limit is not None:
+            end = min(end, start + limit)
+        df = history.iloc[start:end][list(columns)].reset_index(drop=True)
+        df.attrs['data_version'] = version
+        record['rows'] = len(df)
+    return df
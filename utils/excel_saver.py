@@ -1,15 +1,74 @@
-import pandas as pd
+import hashlib
+import threading
+from collections import OrderedDict
 from io import BytesIO
-from pyxlsb import open_workbook as open_xlsb
+import pandas as pd
+
+# Exports longer than this are written by xlsxwriter row by row through a temporary
+# file (constant_memory mode) instead of keeping the whole workbook in memory
+CONSTANT_MEMORY_ROWS = 20000
+
+# Download formats: mime type and file extension
+FORMATS = {'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+           'csv': ('text/csv', 'csv'),
+           'parquet': ('application/vnd.apache.parquet', 'parquet')}
 
 def to_excel(df):
+    import xlsxwriter
+    constant_memory = len(df) > CONSTANT_MEMORY_ROWS
+    output = BytesIO()
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': constant_memory, 'in_memory': not constant_memory})
+    worksheet = workbook.add_worksheet('Sheet1')
+    # Same header style as pandas' to_excel
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    format1 = workbook.add_format({'num_format': '0.00'})
+    worksheet.set_column('A:A', None, format1)
+    worksheet.write_row(0, 0, [str(column) for column in df.columns], header_format)
+    # constant_memory mode needs the cells row by row. NaN is left empty, as pandas does
+    values = df.astype(object).where(df.notna(), None)
+    for row, record in enumerate(values.itertuples(index=False, name=None), start=1):
+        worksheet.write_row(row, 0, record)
+    workbook.close()
+    return output.getvalue()
+
+def to_csv(df):
+    return df.to_csv(index=False).encode('utf-8')
+
+def iter_csv(df, chunk_rows=10000):
+    # Yields the CSV in encoded pieces of chunk_rows rows, for streaming responses
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(index=False, header=start == 0).encode('utf-8')
+
+def to_parquet(df):
     output = BytesIO()
-    writer = pd.ExcelWriter(output, engine='xlsxwriter')
-    df.to_excel(writer, index=False, sheet_name='Sheet1')
-    workbook = writer.book
-    worksheet = writer.sheets['Sheet1']
-    format1 = workbook.add_format({'num_format': '0.00'}) 
-    worksheet.set_column('A:A', None, format1)  
-    writer.close()
-    processed_data = output.getvalue()
-    return processed_data
+    df.to_parquet(output, index=False)
+    return output.getvalue()
+
+EXPORTERS = {'xlsx': to_excel, 'csv': to_csv, 'parquet': to_parquet}
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_max_entries = 32
+
+def get_content_hash(df):
+    digest = hashlib.sha256(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    digest.update('\x00'.join(map(str, df.columns)).encode('utf-8'))
+    return digest.hexdigest()
+
+def export(df, file_format='xlsx'):
+    """
+    Returns the frame exported to file_format. Exports are cached per process by
+    the content hash of the frame, so reruns of a page with the same forecast
+    reuse the bytes instead of rebuilding the file
+    """
+    key = (get_content_hash(df), file_format)
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    data = EXPORTERS[file_format](df)
+    with _lock:
+        _cache[key] = data
+        if len(_cache) > _max_entries:
+            _cache.popitem(last=False)
+    return data
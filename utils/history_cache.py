@@ -0,0 +1,182 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import pandas as pd
+from model.instrumentation import stage, COUNTERS
+from utils.power_cons_db import read_power_cons, POWER_CONS_COLUMNS
+
+# Local copy of power_cons, next to the forecast archive
+CACHE_DIR = os.environ.get('POWER_FORECAST_CACHE_DIR',
+                           os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'power_cons'))
+# Parts are merged into one file when there are more than this many
+MAX_PARTS = 32
+
+logger = logging.getLogger('power_consumption.history')
+
+class HistoryCache():
+    """
+    Local Parquet copy of power_cons that is refreshed incrementally. Only the
+    rows after the watermark (the last date and hour seen) are queried, and they
+    are appended as a new part file, so a refresh costs O(new rows) instead of
+    O(history). Rows already cached are assumed not to change; clear() forces a
+    full reload. If the database cannot be reached, the cached rows are served.
+
+    version is a token that changes with every appended batch of rows and is
+    kept across restarts, downstream caches key on it. The rows are kept sorted
+    by date and hour and indexed by hour, so a date range or the first rows are
+    a slice found by binary search
+    """
+    def __init__(self, path=CACHE_DIR):
+        self.path = path
+        self.lock = threading.Lock()
+        self.df = None
+        self.state = None
+        self.refreshed = None
+        # rows in memory that the files do not have, after a failed write
+        self.unsaved = False
+
+    @property
+    def version(self):
+        return self.state['version'] if self.state else None
+
+    @property
+    def watermark(self):
+        return tuple(self.state['watermark']) if self.state and self.state['watermark'] else None
+
+    def load(self):
+        # Reads the parts listed in state.json, a missing or broken cache is rebuilt from scratch
+        try:
+            with open(os.path.join(self.path, 'state.json'), encoding='utf-8') as file:
+                state = json.load(file)
+            parts = [pd.read_parquet(os.path.join(self.path, name)) for name in state['parts']]
+        except (OSError, ValueError, KeyError) as error:
+            if not isinstance(error, FileNotFoundError):
+                logger.warning('history cache %s is not readable, it is reloaded: %s', self.path, error)
+            return None, None
+        df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=POWER_CONS_COLUMNS)
+        return index_by_hour(df), state
+
+    def save(self, new_rows, state):
+        # The new part is written first and state.json is replaced last, so readers
+        # and restarts see either the previous or the new cache, never a mix.
+        # Parts replaced by a compaction are removed only after that
+        os.makedirs(self.path, exist_ok=True)
+        name = f"part-{len(state['parts']) + 1:06d}-{state['version'][:8]}.parquet"
+        written = [os.path.join(self.path, name)]
+        replaced = []
+        try:
+            new_rows.to_parquet(written[0], index=False)
+            state = dict(state, parts=state['parts'] + [name])
+            if self.unsaved or len(state['parts']) > MAX_PARTS:
+                replaced = state['parts']
+                state = self.compact(state)
+                written.append(os.path.join(self.path, state['parts'][0]))
+            write_json(os.path.join(self.path, 'state.json'), state)
+        except OSError:
+            # state.json does not list the files of this save, so nothing would remove them
+            for path in written:
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+        self.unsaved = False
+        for old in replaced:
+            if old not in state['parts'] and os.path.exists(os.path.join(self.path, old)):
+                os.remove(os.path.join(self.path, old))
+        return state
+
+    def compact(self, state):
+        # Writes the whole frame as one part, the parts it replaces stay until state.json lists it
+        name = f"part-000001-{state['version'][:8]}.parquet"
+        temporary = os.path.join(self.path, f'.{name}')
+        self.df.to_parquet(temporary, index=False)
+        os.replace(temporary, os.path.join(self.path, name))
+        return dict(state, parts=[name])
+
+    def refresh(self, engine):
+        """
+        Queries the rows after the watermark through engine and appends them.
+        Returns the number of new rows, None if the database was not reachable
+        """
+        with self.lock:
+            if self.df is None:
+                with stage('load_history_cache') as record:
+                    self.df, self.state = self.load()
+                    record['rows'] = None if self.df is None else len(self.df)
+            with stage('refresh_history') as record:
+                from sqlalchemy.exc import DBAPIError
+                try:
+                    new_rows = read_power_cons(engine, after=self.watermark)
+                except (DBAPIError, OSError) as error:
+                    # an unreachable or restarting database. Other errors, e.g. a
+                    # renamed column, are bugs and raise instead of serving stale rows
+                    COUNTERS.increment('history_refresh_errors')
+                    if self.df is None:
+                        raise
+                    # retried at the next refresh interval
+                    self.refreshed = time.monotonic()
+                    logger.warning('power_cons refresh failed, serving %s cached rows: %s', len(self.df), error)
+                    return None
+                new_rows = index_by_hour(new_rows)
+                record['rows'] = len(new_rows)
+            self.refreshed = time.monotonic()
+            if self.df is not None and len(new_rows) == 0:
+                return 0
+
+            #new rows are after the watermark, so the frame stays sorted
+            df = new_rows if self.df is None else pd.concat([self.df, new_rows])
+            watermark = self.state['watermark'] if self.state else None
+            if len(new_rows):
+                dates = pd.to_datetime(new_rows['date'])
+                watermark = [dates.max().strftime('%Y-%m-%d'), int(new_rows.loc[dates == dates.max(), 'time'].max())]
+            # the version chains the previous one with the hash of the new rows
+            digest = hashlib.sha256((self.version or '').encode('ascii'))
+            digest.update(pd.util.hash_pandas_object(new_rows, index=False).to_numpy().tobytes())
+            state = {'version': digest.hexdigest()[:16], 'watermark': watermark, 'rows': len(df),
+                     'parts': self.state['parts'] if self.state else []}
+            self.df = df
+            try:
+                state = self.save(new_rows, state)
+            except OSError as error:
+                # the rows are still served from memory, the next successful write
+                # saves all of them
+                self.unsaved = True
+                logger.warning('history cache %s was not written: %s', self.path, error)
+            self.state = state
+            return len(new_rows)
+
+    def get(self, engine, max_age=600):
+        """
+        Returns the cached power_cons and its version, refreshed first if the last
+        refresh is older than max_age seconds. The frame is shared, callers copy it
+        before changing it
+        """
+        if self.df is None or self.refreshed is None or time.monotonic() - self.refreshed > max_age:
+            self.refresh(engine)
+        with self.lock:
+            return self.df, self.version
+
+    def clear(self):
+        with self.lock:
+            for name in (self.state or {}).get('parts', []):
+                if os.path.exists(os.path.join(self.path, name)):
+                    os.remove(os.path.join(self.path, name))
+            if os.path.exists(os.path.join(self.path, 'state.json')):
+                os.remove(os.path.join(self.path, 'state.json'))
+            self.df, self.state, self.refreshed, self.unsaved = None, None, None, False
+
+def index_by_hour(df):
+    # Rows indexed by hour and sorted by it, that is by date and time
+    hours = pd.DatetimeIndex(pd.to_datetime(df['date'])).normalize() + pd.to_timedelta(df['time'].to_numpy(dtype='int64'), unit='h')
+    df = df.set_axis(hours.rename('timestamp'))
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index(kind='stable')
+    return df
+
+def write_json(path, data):
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(data, file)
+    os.replace(temporary, path)
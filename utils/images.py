@@ -0,0 +1,17 @@
+import base64
+from functools import lru_cache
+
+FLAG_FILES = ["images/russia.png", "images/united-kingdom.png"]
+
+@lru_cache(maxsize=None)
+def get_flag_images():
+    """
+    Returns the language flags of the sidebar as data URIs. The files are
+    read and encoded once per process instead of on every rerun
+    """
+    images = []
+    for file in FLAG_FILES:
+        with open(file, "rb") as image:
+            encoded = base64.b64encode(image.read()).decode()
+            images.append(f"data:image/jpeg;base64,{encoded}")
+    return tuple(images)
@@ -0,0 +1,58 @@
+import pandas as pd
+
+# Columns of the power_cons table the predictor reads
+POWER_CONS_COLUMNS = ['date', 'time', 'target', 'temp_pred', 'weather_pred', 'temp']
+# Rows fetched from the server-side cursor at a time
+CHUNK_ROWS = 50000
+
+def build_query(columns=POWER_CONS_COLUMNS, start_date=None, end_date=None, limit=None, after=None):
+    """
+    Returns the SQL and its parameters for the given columns of power_cons with
+    the date bounds (inclusive) applied by the database. A limit returns the
+    first rows by date and hour. after is a (date, time) watermark: only the
+    rows after that hour are returned
+    """
+    unknown = [column for column in columns if column not in POWER_CONS_COLUMNS]
+    if unknown:
+        raise ValueError(f'unknown power_cons columns {unknown}, expected some of {POWER_CONS_COLUMNS}')
+    query = f"SELECT {', '.join(columns)} FROM power_cons"
+    conditions, params = [], {}
+    if start_date is not None:
+        conditions.append('date >= :start_date')
+        params['start_date'] = pd.Timestamp(start_date).strftime('%Y-%m-%d')
+    if end_date is not None:
+        conditions.append('date <= :end_date')
+        params['end_date'] = pd.Timestamp(end_date).strftime('%Y-%m-%d')
+    if after is not None:
+        conditions.append('(date > :after_date OR (date = :after_date AND time > :after_time))')
+        params['after_date'] = pd.Timestamp(after[0]).strftime('%Y-%m-%d')
+        params['after_time'] = int(after[1])
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    if limit is not None:
+        query += f' ORDER BY date, time LIMIT {int(limit)}'
+    return query, params
+
+def iter_power_cons(engine, columns=POWER_CONS_COLUMNS, start_date=None, end_date=None, limit=None, chunk_rows=CHUNK_ROWS,
+                    after=None):
+    """
+    Yields power_cons in frames of up to chunk_rows rows. The rows are streamed
+    from a server-side cursor, so the driver never holds the whole result.
+    engine is any SQLAlchemy engine, e.g. the pooled one of st.connection or
+    sqlite:// for local runs
+    """
+    from sqlalchemy import text
+    query, params = build_query(columns, start_date, end_date, limit, after)
+    with engine.connect() as connection:
+        connection = connection.execution_options(stream_results=True, max_row_buffer=chunk_rows)
+        yield from pd.read_sql_query(text(query), connection, params=params, chunksize=chunk_rows)
+
+def read_power_cons(engine, columns=POWER_CONS_COLUMNS, start_date=None, end_date=None, limit=None, chunk_rows=CHUNK_ROWS,
+                    after=None):
+    """
+    Returns power_cons as one frame, see iter_power_cons
+    """
+    chunks = list(iter_power_cons(engine, columns, start_date, end_date, limit, chunk_rows, after))
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(chunks, ignore_index=True)
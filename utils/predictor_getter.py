@@ -0,0 +1,43 @@
+import streamlit as st
+import pandas as pd
+from utils.df_getter import get_df
+
+def get_data_version(df):
+    # Version of the dataset, used as the predictor cache key. get_df frames
+    # carry the history cache version, which changes whenever new rows are
+    # appended; other frames are fingerprinted by their content
+    version = df.attrs.get('data_version')
+    if version is not None:
+        return version
+    return str(pd.util.hash_pandas_object(df, index=False).sum())
+
+# One predictor per process, shared read-only by all sessions. max_entries=1
+# evicts the predictor built for the previous data version
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _build_predictor(data_version, _df):
+    # The predictor needs sklearn and lightgbm, which are slow to import, so
+    # they are imported when the first predictor is built, not with the page
+    from model.power_comsumption_predictor import PowerConsumptionPredictor
+    from model.forecast_archive import ForecastArchive
+    from model.model_registry import get_model_version
+    # Past forecasts are materialized once per model version, a new data
+    # version only adds the days closed since the last update
+    archive = ForecastArchive(get_model_version())
+    predictor = PowerConsumptionPredictor(_df, data_version=data_version, archive=archive)
+    archive.update(predictor)
+    return predictor
+
+def get_predictor(df=None):
+    """
+    Returns the process-wide predictor for the current data version.
+    The predictor is rebuilt only when the history cache of get_df
+    appends new rows. df is the result of get_df if it was
+    already fetched
+    """
+    if df is None:
+        df = get_df()
+    return _build_predictor(get_data_version(df), df)
+
+def invalidate_predictor():
+    # Drop the shared predictor, the next get_predictor call rebuilds it
+    _build_predictor.clear()
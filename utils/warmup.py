@@ -0,0 +1,102 @@
+import contextvars
+import threading
+import time
+from model.instrumentation import trace, stage
+from model.model_registry import get_model, has_model
+from model.reference_data import get_reference_data
+
+class Warmup():
+    """
+    Builds the predictor in a background thread. The data fetch, the reference
+    files and the model files are independent, so they are loaded in parallel
+    threads, and the predictor is built from them once all are in. Pages poll
+    progress and finished instead of blocking before their first element
+    """
+    def __init__(self, load_df, build_predictor):
+        self.load_df = load_df
+        self.build_predictor = build_predictor
+        self.steps = ['get_df', 'reference_data', 'load_stage1', 'load_stage2', 'build_predictor']
+        self.done = []
+        self.predictor = None
+        self.error = None
+        self.started = time.perf_counter()
+        self.seconds = None
+        self.finished = threading.Event()
+
+    @property
+    def progress(self):
+        return len(self.done) / len(self.steps)
+
+    def run_step(self, name, function, results):
+        try:
+            with stage(f'warmup_{name}'):
+                results[name] = function()
+        except Exception as error:
+            self.error = self.error or error
+        self.done.append(name)
+
+    def run(self):
+        results = {}
+        try:
+            with trace('warmup'):
+                loads = {'get_df': self.load_df,
+                         'reference_data': get_reference_data,
+                         'load_stage1': lambda: get_model('stage1'),
+                         # a missing stage 2 model only fails the forecasts, as without the warm-up
+                         'load_stage2': lambda: get_model('stage2') if has_model('stage2') else None}
+                # each thread reports its stage into the warmup trace
+                threads = [threading.Thread(target=contextvars.copy_context().run, args=(self.run_step, name, function, results),
+                                            name=f'warmup-{name}', daemon=True) for name, function in loads.items()]
+                for thread in threads:
+                    add_context(thread)
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                if self.error is None:
+                    self.run_step('build_predictor', lambda: self.build_predictor(results['get_df']), results)
+                self.predictor = results.get('build_predictor')
+        finally:
+            self.seconds = time.perf_counter() - self.started
+            self.finished.set()
+
+    def start(self):
+        thread = threading.Thread(target=self.run, name='warmup', daemon=True)
+        add_context(thread)
+        thread.start()
+        return self
+
+def add_context(thread):
+    # Streamlit calls made from the thread (connection, caches) are attributed
+    # to the session that started the warm-up instead of logging warnings
+    try:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    except ImportError:
+        return
+    context = get_script_run_ctx(suppress_warning=True)
+    if context is not None:
+        add_script_run_ctx(thread, context)
+
+# The predictor module imports sklearn and lightgbm, which takes a while, so
+# the app's data access and predictor are imported in the warm-up thread
+def fetch_df():
+    from utils.df_getter import get_df
+    return get_df()
+
+def build_predictor(df):
+    from utils.predictor_getter import get_predictor
+    return get_predictor(df)
+
+_current = None
+_lock = threading.Lock()
+
+def start_warmup():
+    """
+    Returns the running warm-up of the process or starts a new one. Once the
+    predictor is cached a new warm-up finishes within milliseconds, and after
+    get_df's TTL expires it rebuilds the predictor in the background as well
+    """
+    global _current
+    with _lock:
+        if _current is None or _current.finished.is_set():
+            _current = Warmup(fetch_df, build_predictor).start()
+        return _current